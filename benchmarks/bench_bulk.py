@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+
+from weather import core
+from weather.core import WeatherReport
+
+CITY_IDS = list(range(1, 41))
+LATENCY = 0.01
+# each step is about four times faster locally; only fail if it gains less than half of that
+SPEEDUP = 2
+
+def test_per_city_vs_bulk_throughput(home, stub_server, transport, token, measure):
+    """
+    Reports per second for current conditions of 40 cities, queried one
+    request per city or in groups of `core.GROUP_SIZE` per request.
+    """
+    transport(base_url=stub_server.base_url)
+    stub_server.latency = LATENCY
+
+    def per_city(concurrency: int) -> None:
+        reports = [WeatherReport(token, f"City{city_id}", 'SI') for city_id in CITY_IDS]
+        assert all(error is None for _, error in core.fetch_reports(reports, concurrency))
+
+    def bulk() -> None:
+        assert len(core.bulk_reports(token, 'SI', city_ids=CITY_IDS)) == len(CITY_IDS)
+
+    sequential = measure('per city, sequential', lambda: per_city(1), rounds=3, per=len(CITY_IDS), unit='report')
+    concurrent = measure('per city, concurrency=8', lambda: per_city(8), rounds=3, per=len(CITY_IDS), unit='report')
+
+    requests = stub_server.requests
+    grouped = measure('bulk (group endpoint)', bulk, rounds=3, warmup=False, per=len(CITY_IDS), unit='report')
+
+    assert stub_server.requests - requests == 3 * -(-len(CITY_IDS) // core.GROUP_SIZE)
+    assert grouped * SPEEDUP < concurrent and concurrent * SPEEDUP < sequential
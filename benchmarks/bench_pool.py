@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+
+from pyowm.commons.http_client import HttpClient
+
+from weather import client
+
+REQUESTS = 100
+# connection reuse saves about a third of each local request; only fail if
+# the shared session is clearly slower than a new connection per request
+HEADROOM = 1.25
+
+def test_latency_with_and_without_connection_reuse(home, stub_server, transport, token, measure):
+    """
+    Latency per report request with PyOWM's own client (a new connection per
+    request), a pooled client with a new session per request and the shared
+    keep-alive session that all reports of a process use.
+    """
+    transport(base_url=stub_server.base_url)
+    pooled = client.get_weather_manager(token).http_client
+    config, root_uri = pooled.config, pooled.root_uri
+    params = {'q': 'Rome'}
+
+    def run(http_client_factory) -> None:
+        for _ in range(REQUESTS):
+            status_code, _ = http_client_factory().get_json('weather', params=params)
+            assert status_code == 200
+
+    pyowm_client = HttpClient(token, config, root_uri, admits_subdomains=False)
+    without_pyowm = measure('pyowm HttpClient', lambda: run(lambda: pyowm_client), rounds=3, per=REQUESTS, unit='request')
+    without_pool = measure('new session per request', lambda: run(lambda: client.PooledHttpClient(token, config, root_uri, client.create_session(), admits_subdomains=False)), rounds=3, per=REQUESTS, unit='request')
+    with_pool = measure('shared session', lambda: run(lambda: pooled), rounds=3, per=REQUESTS, unit='request')
+
+    assert with_pool < HEADROOM * min(without_pool, without_pyowm)
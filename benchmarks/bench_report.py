@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import random
+
+import pytest
+
+from weather import core
+from weather.core import ReportRecord, WeatherReport
+from weather.storage import get_report_store
+
+HISTORY_SIZE = 100_000
+
+def synthetic_history(count: int, locations: int=50, start: float=1_600_000_000):
+    generator = random.Random(0)
+    for index in range(count):
+        temperature = generator.uniform(-10, 35)
+        yield ReportRecord(start + index * 60, f"City{index % locations}", 'SI', temperature - 2, temperature, temperature + 2, generator.uniform(0, 15), generator.randrange(101), generator.randrange(101))
+
+def test_report_latency(weather, measure):
+    """
+    End-to-end latency of `weather report`, including process startup.
+    """
+    uncached = measure('--no-cache', lambda: weather('report', '--no-cache'))
+    cached = measure('cached', lambda: weather('report'))
+    assert weather('report').returncode == 0
+    assert uncached < 5 and cached < 5
+
+def test_batch_throughput(home, stub_server, transport, token, measure):
+    """
+    Reports per second for a batch of locations with sequential and concurrent fetches.
+    """
+    transport(base_url=stub_server.base_url)
+    stub_server.latency = 0.01
+    locations = [f"City{index}" for index in range(64)]
+
+    def batch(concurrency: int):
+        reports = [WeatherReport(token, location, 'SI') for location in locations]
+        assert all(error is None for _, error in core.fetch_reports(reports, concurrency))
+
+    sequential = measure('concurrency=1', lambda: batch(1), rounds=3, per=len(locations), unit='report')
+    concurrent = measure('concurrency=16', lambda: batch(16), rounds=3, per=len(locations), unit='report')
+    # about six times faster locally, so only a much smaller gain fails
+    assert concurrent * 2 < sequential
+
+@pytest.mark.parametrize('backend', ['csv', 'sqlite'])
+def test_list_large_history(weather, measure, backend):
+    """
+    `weather report --list` on a synthetic history of `HISTORY_SIZE` reports.
+    """
+    weather('config', '--storage', backend)
+    report_store = get_report_store(backend)
+    report_store.append(synthetic_history(HISTORY_SIZE))
+
+    tail = measure('--tail 20', lambda: weather('report', '--list', '--tail', '20'), rounds=3)
+    location = measure('--location --limit 100', lambda: weather('report', '--list', '--location', 'City7', '--limit', '100'), rounds=3)
+    everything = measure('--format csv (all)', lambda: weather('report', '--list', '--format', 'csv'), rounds=1, warmup=False)
+
+    assert weather('report', '--list', '--format', 'csv').stdout.count('\n') == HISTORY_SIZE + 1
+    assert tail < 3 and location < 5 and everything < 30
+
+def test_startup(weather, measure):
+    """
+    CLI startup for commands that don't touch the network.
+    """
+    version = measure('--version', lambda: weather('--version'), rounds=10)
+    config_path = measure('config --path', lambda: weather('config', '--path'), rounds=10)
+    assert version < 1.5 and config_path < 1.5
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+"""
+Benchmarks run like tests (`python -m pytest benchmarks`), print their
+timings in the summary and fail only if a result exceeds its budget. Budgets
+are generous, so that they catch regressions rather than slow CI runners.
+"""
+
+import statistics
+import time
+from typing import Callable, List, NamedTuple
+
+import pytest
+
+
+class Measurement(NamedTuple):
+    benchmark: str
+    name: str
+    rounds: int
+    best: float
+    median: float
+    unit: str
+
+MEASUREMENTS: List[Measurement] = []
+
+@pytest.fixture
+def measure(request) -> Callable[..., float]:
+    """
+    Return a function that calls `function` `rounds` times (after one warm-up
+    call unless `warmup` is false), records the timings under `name` and
+    returns the median duration in seconds, divided by `per` (e.g. the
+    number of reports a call produces).
+    """
+    def run(name: str, function: Callable[[], object], rounds: int=5, per: int=1, warmup: bool=True, unit: str='call') -> float:
+        if warmup:
+            function()
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - start) / per)
+        measurement = Measurement(request.node.name, name, rounds, min(timings), statistics.median(timings), unit)
+        MEASUREMENTS.append(measurement)
+        return measurement.median
+
+    return run
+
+def pytest_terminal_summary(terminalreporter) -> None:
+    if not MEASUREMENTS:
+        return
+    terminalreporter.section('benchmarks')
+    width = max(len(f"{measurement.benchmark} {measurement.name}") for measurement in MEASUREMENTS) + 2
+    terminalreporter.write_line(f"{'benchmark'.ljust(width)}{'rounds':>8}{'best (ms)':>14}{'median (ms)':>14}  per")
+    for measurement in MEASUREMENTS:
+        terminalreporter.write_line(f"{f'{measurement.benchmark} {measurement.name}'.ljust(width)}{measurement.rounds:>8}{measurement.best * 1000:>14.3f}{measurement.median * 1000:>14.3f}  {measurement.unit}")
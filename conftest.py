@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+"""
+Shared fixtures of the test and benchmark suites. Both run offline against
+`weather.replay.StubServer` in a throwaway home directory.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+import pytest
+
+# the log file location is resolved when weather.utils is imported, so the
+# home directory is redirected before any test imports the package
+SESSION_HOME = tempfile.mkdtemp(prefix='weather-tests-')
+for variable in ('HOME', 'USERPROFILE', 'LOCALAPPDATA'):
+    os.environ[variable] = SESSION_HOME
+for variable in ('WEATHER_BASE_URL', 'WEATHER_RECORD', 'WEATHER_REPLAY', 'WEATHER_TIMINGS', 'WEATHER_PROFILE'):
+    os.environ.pop(variable, None)
+
+SRC = str(Path(__file__).parent.joinpath('src'))
+TOKEN = '0123456789abcdef0123456789abcdef'
+
+@pytest.fixture
+def token() -> str:
+    return TOKEN
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    """
+    Give the test its own (empty) configuration directory.
+    """
+    for variable in ('HOME', 'USERPROFILE', 'LOCALAPPDATA'):
+        monkeypatch.setenv(variable, str(tmp_path))
+    return tmp_path
+
+@pytest.fixture
+def stub_server():
+    """
+    Serve the stand-in OpenWeather API on a free local port.
+    """
+    from weather.replay import StubServer
+
+    server = StubServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def transport(monkeypatch):
+    """
+    Return `client.configure` and undo its changes to the process-wide
+    transport and weather managers after the test.
+    """
+    from weather import client
+
+    monkeypatch.setattr(client, 'transport', dict(client.transport))
+    monkeypatch.setattr(client, '_weather_managers', dict())
+    return client.configure
+
+@pytest.fixture
+def weather(home, stub_server):
+    """
+    Return a function that runs the `weather` CLI in a new process against
+    the stub server and returns the completed process.
+    """
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [SRC, os.environ.get('PYTHONPATH')])), 'WEATHER_BASE_URL': stub_server.base_url}
+
+    def run(*args: str, **kwargs) -> subprocess.CompletedProcess:
+        return subprocess.run([sys.executable, '-m', 'weather', *args], env={**env, **kwargs.pop('env', dict())}, capture_output=True, text=True, encoding='utf-8', timeout=120, **kwargs)
+
+    run('config', '--token', TOKEN, '--location', 'berlin', '--unit-system', 'si')
+    return run
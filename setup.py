@@ -48,9 +48,11 @@
     },
     python_requires=">=%d.%d" % (python_major, python_minor),
     install_requires=packages,
-    extra_requires={
+    extras_require={
         'dev': dev_packages[1:],
-        'test': ['pytest']
+        'test': ['pytest'],
+        'stats': ['numpy'],
+        'async': ['aiohttp']
     },
     include_package_data=True,
     package_dir={'': 'src'},
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import functools
+import json
+import time
+import weakref
+from typing import Callable, Iterable, List, Optional, Tuple, TypeVar
+
+import aiohttp
+from pyowm.commons import exceptions
+from pyowm.commons.http_client import HttpClient, HttpRequestBuilder
+from pyowm.weatherapi25.forecast import Forecast
+from pyowm.weatherapi25.forecaster import Forecaster
+from pyowm.weatherapi25.observation import Observation
+from pyowm.weatherapi25.uris import OBSERVATION_URI, THREE_HOURS_FORECAST_URI
+
+from . import profiling
+from .client import PooledHttpClient, get_weather_manager, resolves_locations
+from .config import BACKOFF_FACTOR, CONNECT_TIMEOUT, MAX_RETRIES, READ_TIMEOUT
+from .core import Mode, Snapshot, WeatherReport
+from .locations import City
+
+#region async http client
+
+T = TypeVar('T')
+
+async def run_in_thread(function: Callable[..., T], *args) -> T:
+    """
+    Run a blocking `function` (e.g. a SQLite query) in the default executor,
+    so that it doesn't stall the event loop, in the current context so that
+    profiling hooks still receive its spans. Like `asyncio.to_thread`, which
+    requires Python 3.9.
+    """
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(None, functools.partial(context.run, function, *args))
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+_sessions: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+def get_session() -> aiohttp.ClientSession:
+    """
+    Return the keep-alive session shared by all async reports on the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = _sessions[loop] = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT))
+    return session
+
+async def close_session() -> None:
+    """
+    Close the shared session of the running event loop, e.g. on service shutdown.
+    """
+    session = _sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None:
+        await session.close()
+
+class AsyncHttpClient(object):
+    """
+    Non-blocking counterpart of `client.PooledHttpClient` that sends requests
+    through the shared aiohttp session with the same URLs, retries and errors.
+    Recording and replaying clients (see `.replay`) run in the default executor.
+    """
+    def __init__(self, http_client: HttpClient, max_retries: int=MAX_RETRIES, backoff_factor: float=BACKOFF_FACTOR) -> AsyncHttpClient:
+        self.http_client = http_client
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(ROOT_URI={self.http_client.root_uri})"
+
+    async def request(self, path: str, params: Optional[dict]=None, headers: Optional[dict]=None) -> Tuple[int, str]:
+        """
+        Send a GET request to the OpenWeather endpoint `path` and return its status code and body.
+        """
+        if type(self.http_client) is not PooledHttpClient:
+            return await run_in_thread(self.http_client.request, path, params, headers)
+
+        url, params, headers, proxies = HttpRequestBuilder(self.http_client.root_uri, self.http_client.api_key, self.http_client.config, has_subdomains=self.http_client.admits_subdomains)\
+            .with_path(path)\
+            .with_api_key()\
+            .with_language()\
+            .with_query_params(params or dict())\
+            .with_headers(headers or dict())\
+            .build()
+        ssl = None if self.http_client.config['connection']['verify_ssl_certs'] else False
+
+        with profiling.span('http', url=url, params={key: value for key, value in params.items() if key != 'APPID'}) as attributes:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    async with get_session().get(url, params=params, headers=headers, proxy=proxies.get(url.split(':')[0]), ssl=ssl) as response:
+                        status_code, text = response.status, await response.text()
+                        retry_after = response.headers.get('Retry-After', '')
+                except aiohttp.ClientSSLError as error:
+                    raise exceptions.InvalidSSLCertificateError(str(error))
+                except asyncio.TimeoutError:
+                    raise exceptions.TimeoutError('API call timeouted')
+                except aiohttp.ClientError as error:
+                    raise exceptions.APIRequestError(str(error))
+
+                if status_code not in RETRY_STATUS or attempt == self.max_retries:
+                    break
+                await asyncio.sleep(float(retry_after) if retry_after.isdigit() else self.backoff_factor * 2 ** attempt)
+
+            attributes.update(status=status_code, bytes=len(text.encode('utf-8')))
+        return status_code, text
+
+    async def get_json(self, path: str, params: Optional[dict]=None, headers: Optional[dict]=None) -> Tuple[int, dict]:
+        status_code, text = await self.request(path, params, headers)
+        HttpClient.check_status_code(status_code, text)
+        try:
+            return status_code, json.loads(text)
+        except ValueError:
+            raise exceptions.ParseAPIResponseError('Impossible to parse API response data')
+
+#endregion async http client
+
+#region async weather interface
+
+# requests in flight per event loop, shared by all reports on that loop
+_flights: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+class AsyncWeatherReport(WeatherReport):
+    """
+    Weather report for event-loop services: `await fetch()` queries
+    OpenWeather without blocking, after which `build`, `export` and all other
+    properties work on the fetched snapshot exactly like `WeatherReport`.
+    """
+    @property
+    def snapshot(self) -> Snapshot:
+        if self._snapshot is None:
+            raise RuntimeError("%s has not been fetched yet, await fetch() first." % self)
+        return self._snapshot
+
+    async def fetch(self) -> Snapshot:
+        """
+        Return the current snapshot. On first access, a cached response younger
+        than `max_age` is used if available, else OpenWeather is queried.
+        """
+        return await run_in_thread(self._load_cached) or await self.refresh()
+
+    async def refresh(self) -> Snapshot:
+        """
+        Fetch a new observation (or forecast) from OpenWeather and replace the
+        current snapshot. Concurrent refreshes of the same response on this
+        event loop share a single request.
+        """
+        flights = _flights.setdefault(asyncio.get_running_loop(), dict())
+        key = self.cache_key
+        if (flight := flights.get(key)) is None:
+            flight = flights[key] = asyncio.ensure_future(self._fetch())
+            flight.add_done_callback(lambda _: flights.pop(key, None))
+
+        # shielded, so that a cancelled caller doesn't cancel the request for all others
+        timestamp, observation = await asyncio.shield(flight)
+        self._snapshot = self._make_snapshot(observation, timestamp)
+        return self._snapshot
+
+    async def _fetch(self) -> Tuple[float, Observation]:
+        with profiling.span('fetch', self.hooks, location=self.location, mode=self.mode.value):
+            http_client = AsyncHttpClient((self.weather_manager or get_weather_manager(self.token)).http_client)
+            locations = self.locations if resolves_locations() else None
+            city = await run_in_thread(locations.resolve, self.location) if locations is not None else None
+            params = {'q': self.location} if city is None else {'id': city.id}
+
+            if self.mode == Mode.TODAY:
+                _, json_data = await http_client.get_json(OBSERVATION_URI, params=params)
+                observation = Observation.from_dict(json_data)
+                location = observation.location
+            else:
+                _, json_data = await http_client.get_json(THREE_HOURS_FORECAST_URI, params=params)
+                forecast = Forecast.from_dict(json_data)
+                forecast.interval = '3h'
+                observation = Forecaster(forecast)
+                location = forecast.location
+
+            if city is None and locations is not None:
+                await run_in_thread(locations.learn, self.location, City.from_location(location))
+
+        timestamp = time.time()
+        if self.cache is not None:
+            await run_in_thread(self.cache.set, self.cache_key, observation, timestamp)
+        return timestamp, observation
+
+async def fetch_reports(reports: Iterable[AsyncWeatherReport], concurrency: int=64) -> List[Tuple[AsyncWeatherReport, Optional[Exception]]]:
+    """
+    Fetch all `reports` with at most `concurrency` requests in flight and
+    return them in order, each with the exception it failed with (if any).
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(report: AsyncWeatherReport) -> Tuple[AsyncWeatherReport, Optional[Exception]]:
+        async with semaphore:
+            try:
+                await report.fetch()
+                return report, None
+            except Exception as error:
+                return report, error
+
+    return await asyncio.gather(*map(fetch, reports))
+
+#endregion async weather interface
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+import pickle
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional, Tuple, Union
+
+from . import utils
+from .config import CACHE_MAX_ENTRIES, CACHEFILE
+
+#region response cache
+
+class ResponseCache(object):
+    """
+    Persistent, size-bounded store for OpenWeather responses keyed by
+    (location, mode, unit system). Entries are evicted in LRU order once
+    `max_entries` is exceeded. SQLite serializes writes across processes.
+    """
+    def __init__(self, path: Optional[Union[str, Path]]=None, max_entries: int=CACHE_MAX_ENTRIES) -> ResponseCache:
+        self.path = Path(path) if path else utils.get_resource_path(CACHEFILE)
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                location TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                unit_system TEXT NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                payload BLOB NOT NULL,
+                PRIMARY KEY (location, mode, unit_system)
+            )
+        """)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(PATH={self.path})"
+
+    def __enter__(self) -> ResponseCache:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def get(self, key: Tuple[str, str, str], max_age: float) -> Optional[Tuple[float, Any]]:
+        """
+        Return `(created, value)` for `key` if it was stored less than `max_age` seconds ago.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT created, payload FROM responses WHERE location=? AND mode=? AND unit_system=?", key
+            ).fetchone()
+
+            if row is None or time.time() - row[0] > max_age:
+                return None
+
+            try:
+                value = pickle.loads(row[1])
+            except Exception as error:
+                # written by another PyOWM version or corrupted, so it is fetched again
+                utils.logger.warning("Discarding unreadable cache entry %s: %r" % (key, error))
+                self.connection.execute("DELETE FROM responses WHERE location=? AND mode=? AND unit_system=?", key)
+                return None
+
+            self.connection.execute(
+                "UPDATE responses SET accessed=?, hits=hits+1 WHERE location=? AND mode=? AND unit_system=?", (time.time(), *key)
+            )
+        return row[0], value
+
+    def set(self, key: Tuple[str, str, str], value: Any, created: Optional[float]=None) -> None:
+        """
+        Store `value` under `key` and evict the least recently used entries beyond `max_entries`.
+        """
+        now = time.time()
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.lock, self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, 0, ?)", (*key, created or now, now, payload)
+            )
+            self.connection.execute(
+                "DELETE FROM responses WHERE rowid NOT IN (SELECT rowid FROM responses ORDER BY accessed DESC LIMIT ?)", (self.max_entries,)
+            )
+
+    def purge(self) -> int:
+        """
+        Delete all entries and return how many were removed.
+        """
+        with self.lock:
+            count = self.connection.execute("DELETE FROM responses").rowcount
+            self.connection.execute("VACUUM")
+        return count
+
+    def stats(self) -> dict:
+        """
+        Return a summary of the cache contents.
+        """
+        with self.lock:
+            entries, size, hits, oldest = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(payload)), 0), COALESCE(SUM(hits), 0), MIN(created) FROM responses"
+            ).fetchone()
+        return {
+            'Path': self.path,
+            'Entries': f"{entries}/{self.max_entries}",
+            'Size': f"{size / 1024:.1f} KiB",
+            'Hits': hits,
+            'Oldest': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(oldest)) if oldest else '-'
+        }
+
+#endregion response cache
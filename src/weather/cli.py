@@ -1,21 +1,31 @@
 #!/usr/bin/env python3
 
 import argparse
-import csv
+import atexit
+import os
 import re
-from collections import namedtuple
-from typing import Optional
+import sys
+import time
+from datetime import datetime as dt
+from itertools import chain, islice
+from typing import Iterable, Iterator, List, Optional, Tuple
 
-from pyowm.commons.exceptions import UnauthorizedError
-
-from . import core, utils
+from . import core, profiling, units, utils
 from .__init__ import __version__, package_name
-from .config import (BRIGHT, CONFIGFILE, GREEN, LOGFILE, MAGENTA, REPORTFILE,
-                     RESET_ALL)
+from .cache import ResponseCache
+from .config import (BRIGHT, CACHE_TTL, CONFIGFILE, GREEN, LOGFILE, MAGENTA,
+                     RED, RESET_ALL)
 from .core import Mode, UnitSystem
+from .export import EXPORT_FORMATS, TEXT_FORMATS
+from .locations import LocationIndex
+from .storage import (FIELDNAMES, STORAGE_BACKENDS, ReportStore, get_report_store,
+                      migrate)
 
 #region argparse pseudo type checking
 
+# values of boolean environment variables (e.g. WEATHER_TIMINGS) that turn them on
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
 def validate_token(token: str) -> Optional[str]:
     if not re.match(r'[0-9a-f]{32}', token):
         err_msg = "It looks like you've entered an invalid API token. This incident will be reported."
@@ -32,12 +42,146 @@ def validate_hour(hour: str) -> Optional[str]:
     else:
         return int(hour)
 
+def validate_datetime(value: str) -> Optional[float]:
+    try:
+        return dt.fromisoformat(value).timestamp()
+    except ValueError:
+        err_msg = "%s is not a valid ISO 8601 date (e.g. 2021-09-30 or 2021-09-30T15:00)." % value
+        utils.logger.error(err_msg)
+        utils.print_on_error(err_msg)
+
+def validate_count(value: str) -> int:
+    if not value.strip().isdigit():
+        err_msg = "%s is not a valid number of entries (0 or more)." % value
+        utils.logger.error(err_msg)
+        raise argparse.ArgumentTypeError(err_msg)
+    return int(value)
+
 #endregion argparse pseudo type checking
 
+def handle_report_error(error: Exception, location: Optional[str]=None) -> None:
+    """
+    Report a failed weather report without aborting the remaining locations.
+    """
+    from pyowm.commons.exceptions import NotFoundError, UnauthorizedError
+
+    suffix = f" ({location})" if location else ''
+    if isinstance(error, UnauthorizedError):
+        utils.print_on_error("Unauthorized access: OpenWeather denied servicing your request%s." % suffix)
+    elif isinstance(error, NotFoundError):
+        utils.print_on_error("OpenWeather could not find a location named %s." % location)
+        with LocationIndex() as location_index:
+            if location and location_index.built and (cities := location_index.search(location, limit=3)):
+                utils.print_on_warning("Did you mean %s?" % ', '.join(dict.fromkeys(city.query for city in cities)))
+    elif isinstance(error, ValueError):
+        utils.print_on_warning("%s Skipped." % error)
+    else:
+        utils.print_on_error("Something unexpected happend%s. The responsible authorities have already been notified." % suffix)
+    utils.logger.error(str(error))
+
+def report_records(results: Iterable[Tuple[core.WeatherReport, Optional[Exception]]], saved: Optional[List[core.ReportRecord]]=None) -> Iterator[core.ReportRecord]:
+    """
+    Yield the record of every report in `results` as soon as it is fetched,
+    report failed ones and collect all records in `saved` if it is set.
+    """
+    for weather_report, error in results:
+        if error is not None:
+            handle_report_error(error, weather_report.location)
+            continue
+
+        record = weather_report.record()
+        if saved is not None:
+            saved.append(record)
+        yield record
+
+def write_records(records: Iterable[core.ReportRecord], format: str, flush: bool=False) -> None:
+    """
+    Write `records` to stdout in one of `TEXT_FORMATS`.
+    """
+    try:
+        EXPORT_FORMATS[format](records, sys.stdout, flush=flush)
+    except BrokenPipeError:
+        # the reading end was closed early (e.g. by `head`), which is not an error
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+def print_timings() -> None:
+    """
+    Print a breakdown of all recorded spans and the HTTP requests among them to stderr.
+    """
+    profiler = profiling.profiler
+    wall = time.perf_counter() - profiler.origin
+    summary = profiler.summary()
+    utils.print_table(
+        ['Phase', 'Count', 'Total', 'Mean', 'Max', 'Share'],
+        [
+            [name, entry['count'], f"{entry['total'] * 1000:.2f}ms", f"{entry['total'] / entry['count'] * 1000:.2f}ms", f"{entry['max'] * 1000:.2f}ms", f"{entry['total'] / wall:.1%}"]
+            for name, entry in summary.items()
+        ] + [['wall', 1, f"{wall * 1000:.2f}ms", '', '', '100.0%']],
+        file=sys.stderr
+    )
+
+    requests = [span for span in profiler.spans if span.name == 'http']
+    if requests:
+        utils.print_table(
+            ['Request', 'Params', 'Status', 'Bytes', 'Duration'],
+            [[span.attributes['url'], span.attributes['params'], span.attributes.get('status', 'failed'), span.attributes.get('bytes', 0), f"{span.duration * 1000:.2f}ms"] for span in requests],
+            file=sys.stderr
+        )
+
+    if (output := profiler.dump()) is not None:
+        utils.print_on_success("Wrote profile to %s" % output)
+
+WATCH_FIELDS = ['Date', 'Location', 'TemperatureMin', 'TemperatureNow', 'TemperatureMax', 'WindSpeed', 'Humidity', 'CloudCoverage']
+
+def watch(reports: List[core.WeatherReport], interval: int, concurrency: int=8, report_store: Optional[ReportStore]=None) -> None:
+    """
+    Refresh `reports` every `interval` seconds, aligned to the clock (e.g. at
+    :00, :10, :20 for 600), and repaint only the table cells that changed.
+    """
+    table = utils.LiveTable(WATCH_FIELDS)
+    rows = {weather_report.location: ['-', weather_report.location, *['-'] * (len(WATCH_FIELDS) - 2)] for weather_report in reports}
+    refresh = False
+
+    try:
+        while True:
+            failed, saved = [], []
+            for weather_report, error in core.fetch_reports(reports, concurrency, refresh):
+                if error is not None:
+                    failed.append(weather_report.location)
+                    utils.logger.error(str(error))
+                    continue
+
+                record = weather_report.record()
+                data = record.format()
+                rows[weather_report.location] = [data['Date'].strftime('%a %d %b %I:%M %p'), *(data[key] for key in WATCH_FIELDS[1:])]
+                if report_store is not None:
+                    saved.append(record)
+
+            if saved:
+                report_store.append(saved)
+
+            next_update = (time.time() // interval + 1) * interval
+            status = "Updated at %s, next update at %s (Ctrl+C to quit)" % (time.strftime('%H:%M:%S'), time.strftime('%H:%M:%S', time.localtime(next_update)))
+            if failed:
+                status += f" {RED}Failed: {', '.join(failed)}{RESET_ALL}"
+            table.render(rows.values(), status)
+
+            refresh = True
+            time.sleep(max(0, next_update - time.time()))
+    except KeyboardInterrupt:
+        sys.stdout.write('\n')
+
 def cli():
+    started = time.perf_counter()
+
     parser = argparse.ArgumentParser()
     parser.add_argument('--version', action='version', version=f"%(prog)s {__version__}")
     parser.add_argument('--verbose', default=False, action='store_true', help="increase output verbosity")
+    parser.add_argument('--base-url', type=str, metavar='URL', help="send requests to another OpenWeather-compatible server (e.g. python -m weather.replay)")
+    parser.add_argument('--record', type=str, metavar='DIR', help="store every OpenWeather response in DIR")
+    parser.add_argument('--replay', type=str, metavar='DIR', help="answer OpenWeather requests from responses recorded in DIR")
+    parser.add_argument('--timings', default=os.environ.get('WEATHER_TIMINGS', '').strip().lower() in TRUE_VALUES, action='store_true', help="print where the time went after the command completes (or set WEATHER_TIMINGS=1)")
+    parser.add_argument('--profile', default=os.environ.get('WEATHER_PROFILE'), type=str, metavar='FILE', help="also write a Chrome trace (*.json) or cProfile statistics (any other extension) to FILE (or set WEATHER_PROFILE)")
 
     subparser = parser.add_subparsers(dest='command')
 
@@ -45,29 +189,100 @@ def cli():
     log_parser.add_argument('--path', action='store_true', help="return the log file path")
     log_parser.add_argument('--reset', action='store_true', help="purge the log file")
     log_parser.add_argument('--list', action='store_true', help='read the log file')
+    log_parser.add_argument('--level', type=str.upper, choices=utils.LOG_LEVELS, help="only list entries of at least this severity")
+    log_parser.add_argument('--since', type=validate_datetime, metavar='DATE', help="only list entries logged on or after this date")
+    log_parser.add_argument('--grep', type=str, metavar='PATTERN', help="only list entries whose message matches this regular expression")
+    log_parser.add_argument('--tail', type=validate_count, metavar='N', help="list only the last N entries")
 
     config_parser = subparser.add_parser('config', help="configure default application settings")
     config_parser.add_argument('--token', nargs='?', type=validate_token, metavar="TOKEN", help="set OpenWeather API key")
     config_parser.add_argument('--location', nargs='?', type=str, help="set a default location")
-    config_parser.add_argument('--unit-system', default=UnitSystem.SI, type=UnitSystem.from_string, choices=list(UnitSystem), help="set a default unit system")
+    config_parser.add_argument('--unit-system', type=UnitSystem.from_string, choices=list(UnitSystem), help="set a default unit system")
+    config_parser.add_argument('--storage', nargs='?', type=str.lower, choices=list(STORAGE_BACKENDS), help="set the storage backend for saved reports")
     config_parser.add_argument('--path', action='store_true', help="return the log file path")
     config_parser.add_argument('--reset', action='store_true', help="purge the config file")
     config_parser.add_argument('--list', action='store_true', help="list all user configuration")
 
     report_parser = subparser.add_parser('report', help="generate a new weather report")
     report_parser.add_argument('--token', nargs='?', type=validate_token, metavar="TOKEN", help="set OpenWeather API key")
-    report_parser.add_argument('--location', nargs='?', type=str, help="set a default location")
-    report_parser.add_argument('--unit-system', default=UnitSystem.SI, type=UnitSystem.from_string, choices=list(UnitSystem), help="set a default unit system")
+    report_parser.add_argument('--location', nargs='*', type=str, metavar='LOCATION', help="set one or more locations")
+    report_parser.add_argument('--locations-file', type=str, metavar='FILE', help="read additional locations from a file (one per line)")
+    report_parser.add_argument('--bbox', nargs=4, type=float, metavar=('LON_LEFT', 'LAT_BOTTOM', 'LON_RIGHT', 'LAT_TOP'), help="report on all cities inside a bounding box with a single request")
+    report_parser.add_argument('--city-ids', nargs='+', type=int, metavar='ID', help="report on several OpenWeather city IDs with a single request")
+    report_parser.add_argument('--concurrency', default=8, type=int, metavar='N', help="number of locations to fetch in parallel (defaults to 8)")
+    report_parser.add_argument('--unit-system', type=UnitSystem.from_string, choices=list(UnitSystem), help="set a unit system (defaults to your configuration)")
     report_parser.add_argument('--hour', default=15, nargs='?', type=validate_hour, metavar='HOUR', help="set hour for tomorrow's forecast (defaults to 15)")
+    report_parser.add_argument('--at', nargs='+', type=validate_datetime, metavar='DATE', help="report the forecast for one or more points in time (ISO 8601)")
+    report_parser.add_argument('--horizon', nargs='+', type=int, metavar='HOURS', help="report the forecast for one or more hours from now (up to 120)")
+    report_parser.add_argument('--interpolate', default=False, action='store_true', help="interpolate between forecast slots instead of using the nearest one")
     report_parser.add_argument('--mode', default=Mode.TODAY, type=Mode.from_string, choices=list(Mode), help="set new type of weather forecast (defaults to today)")
     report_parser.add_argument('--save', default=False, action='store_true', help="save weather report (default)")
     report_parser.add_argument('--no-save', dest='save', action='store_false', help="don't save weather report")
     report_parser.add_argument('--path', action='store_true', help="return the save file path")
     report_parser.add_argument('--reset', action='store_true', help="purge the save file")
     report_parser.add_argument('--list', action='store_true', help="read the save file")
+    report_parser.add_argument('--since', type=validate_datetime, metavar='DATE', help="only list reports saved on or after this date")
+    report_parser.add_argument('--until', type=validate_datetime, metavar='DATE', help="only list reports saved on or before this date")
+    report_parser.add_argument('--limit', type=validate_count, metavar='N', help="list at most N reports")
+    report_parser.add_argument('--offset', default=0, type=validate_count, metavar='N', help="skip the first N reports")
+    report_parser.add_argument('--convert', type=UnitSystem.from_string, choices=list(UnitSystem), help="list all reports in this unit system")
+    report_parser.add_argument('--tail', type=validate_count, metavar='N', help="list only the last N reports")
+    report_parser.add_argument('--no-cache', dest='cache', default=True, action='store_false', help="always query OpenWeather and bypass the response cache")
+    report_parser.add_argument('--max-age', type=int, metavar='SECONDS', help="accept cached responses up to this age (defaults to 600 for today, 3600 for tomorrow)")
+    report_parser.add_argument('--watch', type=int, metavar='INTERVAL', help="keep refreshing the reports every INTERVAL seconds (OpenWeather updates about every 600)")
+    report_parser.add_argument('--format', default='table', type=str.lower, choices=['table', *TEXT_FORMATS], help="print reports as colored text (default) or as raw values for other programs")
+
+    report_subparser = report_parser.add_subparsers(dest='action')
+    migrate_parser = report_subparser.add_parser('migrate', help="copy saved reports to another storage backend")
+    migrate_parser.add_argument('--source', default='csv', type=str.lower, choices=list(STORAGE_BACKENDS), help="storage backend to read from (defaults to csv)")
+    migrate_parser.add_argument('--target', default='sqlite', type=str.lower, choices=list(STORAGE_BACKENDS), help="storage backend to write to (defaults to sqlite)")
+    migrate_parser.add_argument('--force', default=False, action='store_true', help="append to a target that already contains reports")
+
+    serve_parser = subparser.add_parser('serve', help="run a local report server that keeps reports warm")
+    serve_parser.add_argument('--token', nargs='?', type=validate_token, metavar="TOKEN", help="set OpenWeather API key")
+    serve_parser.add_argument('--location', nargs='*', type=str, metavar='LOCATION', help="locations to poll in the background (defaults to your configuration)")
+    serve_parser.add_argument('--unit-system', type=UnitSystem.from_string, choices=list(UnitSystem), help="unit system of polled reports (defaults to your configuration)")
+    serve_parser.add_argument('--interval', default=CACHE_TTL['today'], type=int, metavar='SECONDS', help="polling interval (defaults to 600, OpenWeather's update cadence)")
+    serve_parser.add_argument('--port', default=0, type=int, help="port to listen on (defaults to a free port)")
+
+    stats_parser = subparser.add_parser('stats', help="aggregate saved weather reports")
+    stats_parser.add_argument('--location', nargs='*', type=str, metavar='LOCATION', help="only aggregate these locations")
+    stats_parser.add_argument('--since', type=validate_datetime, metavar='DATE', help="only aggregate reports saved on or after this date")
+    stats_parser.add_argument('--until', type=validate_datetime, metavar='DATE', help="only aggregate reports saved on or before this date")
+    stats_parser.add_argument('--unit-system', type=UnitSystem.from_string, choices=list(UnitSystem), help="convert all values to this unit system (defaults to your configuration)")
+    stats_parser.add_argument('--resample', default='day', type=str.lower, choices=['none', 'hour', 'day'], help="aggregate per hour, per day (default) or over the whole period")
+    stats_parser.add_argument('--window', type=int, metavar='N', help="add the rolling mean temperature over the last N periods")
+
+    locations_parser = subparser.add_parser('locations', help="resolve location names to OpenWeather city IDs")
+    locations_parser.add_argument('--path', action='store_true', help="return the location index file path")
+    locations_parser.add_argument('--build', action='store_true', help="(re)import PyOWM's city ID registry into the location index")
+    locations_subparser = locations_parser.add_subparsers(dest='action')
+    search_parser = locations_subparser.add_parser('search', help="search cities by (approximate) name")
+    search_parser.add_argument('query', type=str, metavar='NAME', help="city name, optionally with a country code (e.g. Berlin,DE)")
+    search_parser.add_argument('--limit', default=10, type=validate_count, metavar='N', help="show at most N cities (defaults to 10)")
+
+    cache_parser = subparser.add_parser('cache', help="manage the response cache")
+    cache_parser.add_argument('--path', action='store_true', help="return the cache file path")
+    cache_parser.add_argument('--stats', action='store_true', help="summarize the cache contents")
+    cache_parser.add_argument('--purge', action='store_true', help="delete all cached responses")
 
     args = parser.parse_args()
-    config_data = utils.read_json_file(CONFIGFILE)
+
+    if args.timings or args.profile:
+        profiler = profiling.profiler
+        profiler.enable(args.profile)
+        # everything the CLI imported since the profiler module was loaded
+        profiler.record(profiling.Span('import cli', profiler.origin, started - profiler.origin))
+        profiler.record(profiling.Span('argparse', started, time.perf_counter() - started))
+        atexit.register(print_timings)
+
+    if args.base_url or args.record or args.replay:
+        with profiling.span('import pyowm'):
+            from . import client
+        client.configure(args.base_url, args.record, args.replay)
+
+    with profiling.span('config'):
+        config_data = utils.read_json_file(CONFIGFILE)
 
     if args.command == 'log':
         logfile = utils.get_resource_path(LOGFILE)
@@ -76,40 +291,47 @@ def cli():
             return logfile
         if args.reset:
             utils.reset_file(logfile)
+            for backup in utils.get_log_backups(logfile):
+                backup.unlink()
             return
         if args.list:
-            with open(logfile, mode='r', encoding='utf-8') as file_handler:
-                log = file_handler.readlines()
-
-                if not log:
-                    utils.print_on_warning("Nothing to read because the log file is empty")
-                    return
-
-                parse = lambda line: line.strip('\n').split('::')
-                Entry = namedtuple('Entry', 'timestamp levelname lineno name message')
-
-                tabulate = "{:<20} {:<5} {:<6} {:<14} {:<20}".format
+            try:
+                pattern = re.compile(args.grep) if args.grep else None
+            except re.error as error:
+                utils.print_on_error("%s is not a valid regular expression (%s)." % (args.grep, error))
+                return
 
-                print('\n' + GREEN + tabulate('Timestamp', 'Line', 'Level', 'File Name', 'Message') + RESET_ALL)
+            filters = {
+                'level': args.level,
+                'since': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(args.since)) if args.since else None,
+                'pattern': pattern
+            }
+            entries = iter(utils.tail_log(logfile, args.tail, **filters) if args.tail is not None else utils.read_log(logfile, **filters))
 
-                for line in log:
-                    entry = Entry(parse(line)[0], parse(line)[1], parse(line)[2], parse(line)[3], parse(line)[4])
-                    print(tabulate(entry.timestamp, entry.lineno.zfill(4), entry.levelname, entry.name, entry.message))
+            if (first := next(entries, None)) is None:
+                utils.print_on_warning("Nothing to read because no log entries match your query")
+                return
 
-                print()
+            tabulate = "{:<20} {:<5} {:<9} {:<14} {}\n".format
+            utils.write_lines(chain(
+                ['\n', GREEN + tabulate('Timestamp', 'Line', 'Level', 'File Name', 'Message').rstrip('\n') + RESET_ALL + '\n'],
+                (tabulate(entry['timestamp'], str(entry['lineno']).zfill(4), entry['level'], entry['name'], entry['message']) for entry in chain([first], entries)),
+                ['\n']
+            ))
 
     if args.command == 'config':
         config_file = utils.get_resource_path(CONFIGFILE)
 
-        if args.token:
-            config_data['Token'] = args.token
-            utils.write_json_file(CONFIGFILE, config_data)
-        if args.location:
-            config_data['Location'] = args.location
-            utils.write_json_file(CONFIGFILE, config_data)
-        if args.unit_system:
-            config_data['UnitSystem'] = args.unit_system.name
-            utils.write_json_file(CONFIGFILE, config_data)
+        changes = {
+            key: value for key, value in (
+                ('Token', args.token),
+                ('Location', args.location),
+                ('UnitSystem', args.unit_system.name if args.unit_system else None),
+                ('Storage', args.storage)
+            ) if value
+        }
+        if changes:
+            config_data = utils.write_json_file(CONFIGFILE, changes)
         if args.path:
             return config_file
         if args.reset:
@@ -119,54 +341,189 @@ def cli():
             utils.print_dict('Name', 'Value', config_data)
             return
 
+    if args.command == 'serve':
+        try:
+            from .daemon import serve
+            unit_system = args.unit_system.name if args.unit_system else config_data.get('UnitSystem', UnitSystem.SI.name)
+            serve(args.token or config_data['Token'], args.location or [config_data['Location']], unit_system, args.interval, port=args.port)
+        except KeyError as key_error:
+            utils.print_on_error("Encountered an error while trying to access %s in the configuration file." % str(key_error))
+            utils.logger.error(str(key_error))
+        return
+
+    if args.command == 'stats':
+        try:
+            from . import stats
+        except ImportError:
+            utils.print_on_error("The stats command requires NumPy. Run 'pip install numpy' to enable it.")
+            return
+
+        unit_system = args.unit_system.name if args.unit_system else config_data.get('UnitSystem', UnitSystem.SI.name)
+        rows = get_report_store(config_data.get('Storage', 'csv')).read(args.location, args.since, args.until)
+        result = stats.aggregate(stats.normalize_units(stats.load_columns(rows), unit_system), args.resample, args.window)
+
+        if not result:
+            utils.print_on_warning("Nothing to aggregate because no saved reports match your query")
+            return
+
+        header = ['Location', 'Period', 'TempMin', 'TempMean', 'TempMax', 'WindMean', 'WindMax', 'Humidity'] + (['TempRolling'] if args.window else []) + ['Count']
+        tabulate = ("{:<16}{:<18}" + "{:<12}" * (len(header) - 2) + "\n").format
+        columns = [result[key] for key in result if key not in ('Location', 'Period', 'Count')]
+        utils.write_lines(chain(
+            ['\n', BRIGHT + GREEN + tabulate(*header).rstrip('\n') + RESET_ALL + '\n'],
+            (
+                tabulate(location, stats.format_period(period, args.resample), *(f"{value:.2f}" for value in values), count)
+                for location, period, count, *values in zip(result['Location'], result['Period'], result['Count'], *columns)
+            ),
+            ['\n']
+        ))
+        return
+
+    if args.command == 'locations':
+        with LocationIndex() as location_index:
+            if args.path:
+                return location_index.path
+            if args.build or (args.action == 'search' and not location_index.built):
+                utils.print_on_success("Building the location index, this only takes a few seconds once ...", args.verbose or not args.build)
+                utils.print_on_success("Indexed %d cities" % location_index.build(), args.verbose or args.build)
+            if args.action == 'search':
+                cities = location_index.search(args.query, args.limit)
+                if not cities:
+                    utils.print_on_warning("No city matches %s" % args.query)
+                    return
+                utils.print_table(['ID', 'Name', 'Country', 'Latitude', 'Longitude'], cities)
+        return
+
+    if args.command == 'cache':
+        with ResponseCache() as response_cache:
+            if args.path:
+                return response_cache.path
+            if args.purge:
+                utils.print_on_success("Removed %d cached responses" % response_cache.purge(), args.verbose)
+                return
+            if args.stats:
+                utils.print_dict('Name', 'Value', response_cache.stats())
+                return
+
     if args.command == 'report':
-        report_file = utils.get_resource_path(REPORTFILE)
+        report_store = get_report_store(config_data.get('Storage', 'csv'))
 
+        if args.action == 'migrate':
+            if args.source == args.target:
+                utils.print_on_error("Source and target storage backend must differ.")
+                return
+            target = get_report_store(args.target)
+            if not args.force and not target.empty():
+                utils.print_on_error("The %s storage backend already contains reports. Use --force to append to them anyway." % args.target)
+                return
+            count = migrate(get_report_store(args.source), target, force=True)
+            utils.print_on_success("Migrated %d reports from %s to %s" % (count, args.source, args.target))
+            return
         if args.path:
-            return report_file
+            return report_store.path
         if args.reset:
-            utils.reset_file(report_file)
+            report_store.reset()
             return
         if args.list:
-            print()
-            with open(report_file, mode='r', encoding='utf-8') as file_handler:
-                reader = csv.DictReader(file_handler)
-                tabulate = "{:<19}{:<10}{:<12}{:<16}{:<16}{:<16}{:<11}{:<10}{:<12}".format
-                print(BRIGHT + GREEN + tabulate(*reader.fieldnames) + RESET_ALL)
-                for row in list(reader):
-                    print(tabulate(*row.values()))
-            print()
+            filters = {
+                'locations': args.location,
+                'since': args.since,
+                'until': args.until,
+                'unit_system': args.unit_system.name if args.unit_system else None
+            }
+            rows = report_store.tail(args.tail, **filters) if args.tail is not None else report_store.read(**filters)
+            rows = islice(rows, args.offset, args.offset + args.limit if args.limit is not None else None)
+            if args.convert:
+                rows = units.convert_stream(rows, args.convert.name)
+            if args.format != 'table':
+                write_records((core.ReportRecord.from_row(list(row.values())) for row in rows), args.format)
+                return
+            tabulate = "{:<19}{:<10}{:<12}{:<16}{:<16}{:<16}{:<11}{:<10}{:<12}\n".format
+            utils.write_lines(chain(
+                ['\n', BRIGHT + GREEN + tabulate(*FIELDNAMES).rstrip('\n') + RESET_ALL + '\n'],
+                (tabulate(*row.values()) for row in rows),
+                ['\n']
+            ))
             return
 
         try:
-            weather_report = core.WeatherReport(
-                args.token or config_data['Token'],
-                args.location or config_data['Location'],
-                args.unit_system.name or config_data['UnitSystem'],
-                args.mode,
-                args.hour
-            )
-
-            data = weather_report.build()
-
-            if args.verbose:
-                print(f"\n{BRIGHT}{MAGENTA}[ {RESET_ALL}Weather Report for {args.mode.value.capitalize()}{BRIGHT}{MAGENTA} ]{RESET_ALL}", sep='')
-                data['Date'] = data['Date'].strftime('%B %d, %Y (%I:%M %p)')
-                utils.print_dict('Name', 'Value', data)
-
-            if not args.verbose:
-                print(f"{BRIGHT}{MAGENTA}[ {RESET_ALL}{data['Date'].strftime('%B %d @ %I:%M %p')}{BRIGHT}{MAGENTA} ]{RESET_ALL} {data['TemperatureNow']} in {data['Location']}")
-
-            if args.save:
-                utils.write_csv(report_file, dict(zip(data.keys(), weather_report.export())))
-                return
+            token = args.token or config_data['Token']
+            unit_system = args.unit_system.name if args.unit_system else config_data.get('UnitSystem', UnitSystem.SI.name)
+
+            if args.bbox or args.city_ids:
+                results = ((weather_report, None) for weather_report in core.bulk_reports(token, unit_system, args.bbox, args.city_ids))
+            else:
+                locations = args.location or ([] if args.locations_file else [config_data['Location']])
+                if args.locations_file:
+                    locations += utils.read_lines(args.locations_file)
+
+                from .daemon import RemoteReport, connect
+                targets = [*filter(None, args.at or []), *(time.time() + hours * 3600 for hours in args.horizon or [])]
+                mode = Mode.TOMORROW if targets else args.mode
+                # the report server answers with its own token and cache settings
+                daemon_client = connect() if args.cache and args.max_age is None and not args.token and not targets and mode != Mode.FORECAST and not args.watch else None
+                if daemon_client is not None:
+                    reports = [RemoteReport(daemon_client, location, unit_system, mode, args.hour) for location in locations]
+                else:
+                    response_cache = ResponseCache() if args.cache else None
+                    location_index = LocationIndex()
+                    reports = [
+                        core.WeatherReport(token, location, unit_system, mode, args.hour, cache=response_cache, max_age=args.max_age, locations=location_index)
+                        for location in locations
+                    ]
+
+                if args.watch:
+                    if args.format != 'table':
+                        utils.print_on_error("--watch only supports the table format.")
+                        return
+                    if targets or mode == Mode.FORECAST:
+                        utils.print_on_error("--watch only supports today's and tomorrow's weather.")
+                        return
+                    if args.watch < 1:
+                        utils.print_on_error("The watch interval must be at least one second.")
+                        return
+                    watch(reports, args.watch, args.concurrency, report_store if args.save else None)
+                    return
+
+                # line-based formats write every report as soon as it is fetched, in any order
+                results = core.fetch_reports(reports, args.concurrency, ordered=args.format not in ('ndjson', 'csv'))
+
+                if targets or mode == Mode.FORECAST:
+                    results = core.project_reports(results, targets or None, args.interpolate)
+
+            rows, table = [], []
+            records = report_records(results, rows if args.save else None)
+
+            if args.format != 'table':
+                # streamed without formatting, so that every record is written as soon as it is fetched
+                write_records(records, args.format, flush=True)
+                records = []
+
+            for record in records:
+                if args.mode == Mode.FORECAST:
+                    # formatted only once the table is printed
+                    table.append(record)
+                    continue
+
+                data = record.format()
+
+                if args.verbose:
+                    print(f"\n{BRIGHT}{MAGENTA}[ {RESET_ALL}Weather Report for {args.mode.value.capitalize()}{BRIGHT}{MAGENTA} ]{RESET_ALL}", sep='')
+                    data['Date'] = data['Date'].strftime('%B %d, %Y (%I:%M %p)')
+                    utils.print_dict('Name', 'Value', data)
+
+                if not args.verbose:
+                    print(f"{BRIGHT}{MAGENTA}[ {RESET_ALL}{data['Date'].strftime('%B %d @ %I:%M %p')}{BRIGHT}{MAGENTA} ]{RESET_ALL} {data['TemperatureNow']} in {data['Location']}")
+
+            if table:
+                utils.print_table(FIELDNAMES, ([data['Date'].strftime('%a %d %b %I:%M %p'), *list(data.values())[1:]] for data in map(core.ReportRecord.format, table)))
+
+            if rows:
+                with profiling.span('save', rows=len(rows)):
+                    report_store.append(rows)
 
         except KeyError as key_error:
             utils.print_on_error("Encountered an error while trying to access %s in the configuration file." % str(key_error))
             utils.logger.error(str(key_error))
-        except UnauthorizedError as auth_error:
-            utils.print_on_error("Unauthorized access: OpenWeather denied servicing your request.")
-            utils.logger.error(str(auth_error))
         except Exception as error:
-            utils.print_on_error("Something unexpected happend. The responsible authorities have already been notified.")
-            utils.logger.error(str(error))
+            handle_report_error(error)
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from copy import deepcopy
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import requests
+from pyowm.commons import exceptions
+from pyowm.commons.http_client import HttpClient, HttpRequestBuilder
+from pyowm.utils import config as pyowm_config
+from pyowm.weatherapi25.weather_manager import WeatherManager
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import profiling
+from .config import (BACKOFF_FACTOR, CONNECT_TIMEOUT, MAX_RETRIES, POOL_SIZE,
+                     READ_TIMEOUT)
+
+#region http client
+
+def create_session(max_retries: int=MAX_RETRIES, backoff_factor: float=BACKOFF_FACTOR, pool_size: int=POOL_SIZE) -> requests.Session:
+    """
+    Return a keep-alive session that retries idempotent requests with
+    exponential backoff on rate limiting (429) and server errors (5xx).
+    """
+    retry = Retry(
+        total=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+class PooledHttpClient(HttpClient):
+    """
+    Drop-in replacement for PyOWM's HTTP client that reuses the connections
+    of a shared `requests.Session` instead of opening a new one per request.
+    """
+    def __init__(self, api_key: str, config: dict, root_uri: str, session: requests.Session, timeout: Tuple[float, float]=(CONNECT_TIMEOUT, READ_TIMEOUT), admits_subdomains: bool=True) -> PooledHttpClient:
+        super().__init__(api_key, config, root_uri, admits_subdomains)
+        self.session = session
+        self.timeout = timeout
+
+    def request(self, path: str, params: Optional[dict]=None, headers: Optional[dict]=None) -> Tuple[int, str]:
+        """
+        Send a GET request to the OpenWeather endpoint `path` and return its status code and body.
+        """
+        url, params, headers, proxies = HttpRequestBuilder(self.root_uri, self.api_key, self.config, has_subdomains=self.admits_subdomains)\
+            .with_path(path)\
+            .with_api_key()\
+            .with_language()\
+            .with_query_params(params or dict())\
+            .with_headers(headers or dict())\
+            .build()
+        with profiling.span('http', url=url, params={key: value for key, value in params.items() if key != 'APPID'}) as attributes:
+            try:
+                response = self.session.get(url, params=params, headers=headers, proxies=proxies, timeout=self.timeout, verify=self.config['connection']['verify_ssl_certs'])
+            except requests.exceptions.SSLError as error:
+                raise exceptions.InvalidSSLCertificateError(str(error))
+            except requests.exceptions.Timeout:
+                raise exceptions.TimeoutError('API call timeouted')
+            except requests.exceptions.ConnectionError as error:
+                raise exceptions.APIRequestError(str(error))
+            attributes.update(status=response.status_code, bytes=len(response.content))
+        return response.status_code, response.text
+
+    def get_json(self, path: str, params: Optional[dict]=None, headers: Optional[dict]=None) -> Tuple[int, dict]:
+        status_code, text = self.request(path, params, headers)
+        HttpClient.check_status_code(status_code, text)
+        try:
+            return status_code, json.loads(text)
+        except ValueError:
+            raise exceptions.ParseAPIResponseError('Impossible to parse API response data')
+
+_lock = threading.Lock()
+_session: Optional[requests.Session] = None
+_weather_managers: Dict[str, WeatherManager] = dict()
+
+# Where requests go: `base_url` points PyOWM at another OpenWeather-compatible
+# server (e.g. `python -m weather.replay`), `record` stores every response in a
+# fixture directory and `replay` answers from one without touching the network
+transport = {
+    'base_url': os.environ.get('WEATHER_BASE_URL'),
+    'record': os.environ.get('WEATHER_RECORD'),
+    'replay': os.environ.get('WEATHER_REPLAY')
+}
+
+def configure(base_url: Optional[str]=None, record: Optional[str]=None, replay: Optional[str]=None) -> None:
+    """
+    Change the transport of all weather managers created from now on.
+    """
+    with _lock:
+        transport.update({key: value for key, value in (('base_url', base_url), ('record', record), ('replay', replay)) if value})
+        _weather_managers.clear()
+
+def resolves_locations() -> bool:
+    """
+    Return whether reports may query OpenWeather by city ID. Recorded fixtures
+    are keyed by the query parameters, so recording and replaying always query
+    by name.
+    """
+    return not (transport['record'] or transport['replay'])
+
+def get_session() -> requests.Session:
+    """
+    Return the process-wide HTTP session.
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+def get_weather_manager(token: str, config: Optional[dict]=None) -> WeatherManager:
+    """
+    Return a weather manager for `token` that is shared by all reports of this
+    process. Pass a PyOWM `config` to override the default settings; managers
+    with a custom config are not shared.
+    """
+    shared = config is None
+    if shared and token in _weather_managers:
+        return _weather_managers[token]
+
+    config = config or deepcopy(pyowm_config.get_default_config())
+    weather_manager = WeatherManager(token, config)
+    root_uri, admits_subdomains = weather_manager.http_client.root_uri, True
+
+    if transport['base_url']:
+        url = urlparse(transport['base_url'])
+        config['connection']['use_ssl'] = url.scheme == 'https'
+        root_uri, admits_subdomains = f"{url.netloc}{url.path.rstrip('/') or '/data/2.5'}", False
+
+    if transport['replay']:
+        from .replay import ReplayHttpClient
+        weather_manager.http_client = ReplayHttpClient(token, config, root_uri, transport['replay'])
+    elif transport['record']:
+        from .replay import RecordingHttpClient
+        weather_manager.http_client = RecordingHttpClient(token, config, root_uri, get_session(), transport['record'], admits_subdomains=admits_subdomains)
+    else:
+        weather_manager.http_client = PooledHttpClient(token, config, root_uri, get_session(), admits_subdomains=admits_subdomains)
+
+    if not shared:
+        return weather_manager
+
+    with _lock:
+        return _weather_managers.setdefault(token, weather_manager)
+
+#endregion http client
@@ -3,6 +3,28 @@
 LOGFILE = 'error.log'
 CONFIGFILE = 'config.json'
 REPORTFILE = 'data.csv'
+REPORTDB = 'data.db'
+CACHEFILE = 'cache.db'
+DAEMONFILE = 'daemon.json'
+LOCATIONDB = 'locations.db'
+LOCKDIR = 'locks'
+
+# OpenWeather refreshes current observations about every 10 minutes and the
+# 3h forecast a few times a day, so these are the default max ages (in seconds)
+# for cached responses per report mode
+CACHE_TTL = {'today': 600, 'tomorrow': 3600, 'forecast': 3600}
+CACHE_MAX_ENTRIES = 512
+
+# the log file is rotated (and compressed) once it exceeds LOG_MAX_BYTES
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+# HTTP connection settings shared by all OpenWeather requests of a process
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5
+POOL_SIZE = 16
 
 
 DIM = '\033[2m'
@@ -4,18 +4,30 @@
 
 import errno
 import sys
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from copy import copy
 from dataclasses import dataclass
 from datetime import datetime as dt
 from datetime import timedelta, timezone
 from enum import Enum, unique
-from typing import List, Optional, Tuple
-
-import pyowm
-from pyowm.weatherapi25.observation import Observation
-from pyowm.weatherapi25.weather import Weather
-from pyowm.weatherapi25.weather_manager import WeatherManager
-
-from .config import BRIGHT, CYAN, DIM, GREEN, NORMAL, RED, RESET_ALL, YELLOW
+from typing import (TYPE_CHECKING, Callable, Dict, Hashable, Iterable, Iterator,
+                    List, NamedTuple, Optional, Sequence, Tuple, TypeVar)
+
+from . import profiling, units, utils
+from .cache import ResponseCache
+from .config import (BRIGHT, CACHE_TTL, CYAN, DIM, GREEN, NORMAL, RED,
+                     RESET_ALL, YELLOW)
+from .locations import City, LocationIndex
+
+if TYPE_CHECKING:
+    # PyOWM takes a considerable amount of time to import, so it is deferred
+    # until a report actually hits the network (see .client)
+    from pyowm.weatherapi25.observation import Observation
+    from pyowm.weatherapi25.weather import Weather
+    from pyowm.weatherapi25.weather_manager import WeatherManager
 
 #region argparse helpers
 
@@ -30,6 +42,7 @@ def from_template(cls, flag: str, selection: str) -> Optional[str]:
 class Mode(Enum):
     TODAY = 'today'
     TOMORROW = 'tomorrow'
+    FORECAST = 'forecast'
 
     def __str__(self) -> str:
         return self.value
@@ -56,13 +69,166 @@ def from_string(selection: str) -> Optional[str]:
 #region weather interface
 
 UNITSYSTEM = [us.name for us in UnitSystem]
+GROUP_SIZE = 20
+FORECAST_INTERVAL = 3 * 3600
+
+@dataclass(frozen=True)
+class Snapshot:
+    """
+    Immutable result of a single OpenWeather request.
+    """
+    observation: Observation
+    weather: Weather
+    datetime: dt
+    timestamp: float
+    forecast: Optional[ForecastIndex] = None
+
+class ReportRecord(NamedTuple):
+    """
+    Raw values of a single weather report in the column order of saved
+    reports. Values are only formatted for display by `format`.
+    """
+    date: float
+    location: str
+    unit_system: str
+    temperature_min: float
+    temperature_now: float
+    temperature_max: float
+    wind_speed: float
+    humidity: int
+    cloud_coverage: int
+
+    @classmethod
+    def from_row(cls, row: Sequence[str]) -> ReportRecord:
+        """
+        Parse an exported row (see `WeatherReport.export`).
+        """
+        date, location, unit_system, temperature_min, temperature_now, temperature_max, wind_speed, humidity, cloud_coverage = row
+        return cls(float(date), location, unit_system, float(temperature_min), float(temperature_now), float(temperature_max), float(wind_speed), int(humidity), int(cloud_coverage))
+
+    def format(self, hooks: Optional[Sequence[profiling.Hook]]=None) -> dict:
+        """
+        Return a dictionary with pre-formatted strings, timed as `build` span.
+        """
+        with profiling.span('build', hooks, location=self.location):
+            padded_percentage = "{:5}%".format
+            return {
+                'Date': dt.fromtimestamp(self.date, tz=timezone.utc),
+                'Location': self.location,
+                'UnitSystem': self.unit_system,
+                'TemperatureMin': WeatherReport.get_temperature_string(self.temperature_min, self.unit_system),
+                'TemperatureNow': WeatherReport.get_temperature_string(self.temperature_now, self.unit_system),
+                'TemperatureMax': WeatherReport.get_temperature_string(self.temperature_max, self.unit_system),
+                'WindSpeed': WeatherReport.get_wind_string(self.wind_speed, self.unit_system),
+                'Humidity': padded_percentage(self.humidity),
+                'CloudCoverage': padded_percentage(self.cloud_coverage)
+            }
+
+class ForecastIndex(object):
+    """
+    Time-indexed view of a 3h forecast that finds the slot for any point in
+    time by bisection instead of scanning all weathers.
+    """
+    def __init__(self, weathers: Iterable[Weather]) -> ForecastIndex:
+        self.weathers = sorted(weathers, key=lambda weather: weather.ref_time)
+        self.times = [weather.ref_time for weather in self.weathers]
+
+    def __len__(self) -> int:
+        return len(self.weathers)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(SLOTS={len(self)})"
+
+    def covers(self, timestamp: float, tolerance: float=FORECAST_INTERVAL) -> bool:
+        """
+        Test whether `timestamp` lies within the forecast, give or take `tolerance` seconds.
+        """
+        return bool(self.times) and self.times[0] - tolerance <= timestamp <= self.times[-1] + tolerance
+
+    def nearest(self, timestamp: float) -> Optional[Weather]:
+        """
+        Return the slot closest to `timestamp`.
+        """
+        if not self.weathers:
+            return None
+
+        index = bisect_left(self.times, timestamp)
+        if index == 0:
+            return self.weathers[0]
+        if index == len(self.times):
+            return self.weathers[-1]
+
+        before, after = self.times[index - 1], self.times[index]
+        return self.weathers[index] if after - timestamp < timestamp - before else self.weathers[index - 1]
+
+    def interpolate(self, timestamp: float) -> Optional[Weather]:
+        """
+        Return a weather whose temperatures, wind speed, humidity and cloud
+        coverage are linearly interpolated between the two adjacent slots.
+        Falls back to the nearest slot outside of the forecast range.
+        """
+        index = bisect_right(self.times, timestamp)
+        if index == 0 or index == len(self.times) or self.times[index - 1] == timestamp:
+            return self.nearest(timestamp)
+
+        lower, upper = self.weathers[index - 1], self.weathers[index]
+        ratio = (timestamp - lower.ref_time) / (upper.ref_time - lower.ref_time)
+        lerp = lambda a, b: a + (b - a) * ratio if a is not None and b is not None else a
+
+        weather = copy(lower)
+        weather.ref_time = int(timestamp)
+        weather.temp = {key: lerp(value, upper.temp.get(key)) for key, value in lower.temp.items()}
+        weather.wnd = {**lower.wnd, 'speed': lerp(lower.wnd.get('speed'), upper.wnd.get('speed'))}
+        weather.humidity = round(lerp(lower.humidity, upper.humidity))
+        weather.clouds = round(lerp(lower.clouds, upper.clouds))
+        return weather
+
+T = TypeVar('T')
+
+class SingleFlight(object):
+    """
+    Lets concurrent calls with the same key share one execution: the first
+    caller runs the function, all others wait for and receive its result
+    (or exception).
+    """
+    def __init__(self) -> SingleFlight:
+        self.lock = threading.Lock()
+        self.calls: Dict[Hashable, Future] = dict()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(IN_FLIGHT={len(self.calls)})"
+
+    def do(self, key: Hashable, function: Callable[[], T]) -> T:
+        with self.lock:
+            future = self.calls.get(key)
+            leader = future is None
+            if leader:
+                future = self.calls[key] = Future()
+
+        if leader:
+            try:
+                future.set_result(function())
+            except BaseException as error:
+                future.set_exception(error)
+            finally:
+                with self.lock:
+                    del self.calls[key]
+
+        return future.result()
+
+# requests in flight in this process, shared by all reports
+flights = SingleFlight()
 
 class WeatherReport(object):
     """
     Defines an interposed interface for the new PyOWM API.
+
+    Pass a `LocationIndex` as `locations` to query OpenWeather by city ID
+    once the location was resolved. Every callable in `hooks` receives a
+    `profiling.Span` for each timed phase of this report (fetching, cache
+    lookup, HTTP requests, `export` when the record is computed, `build` when
+    it is formatted).
     """
-    _temperature_units: dict={'IMPERIAL': 'fahrenheit', 'SI': 'celsius'}
-    _speed_units: dict={'IMPERIAL': 'miles_hour', 'SI': 'meters_sec'}
     _color_map = {
         range(-99, 0): DIM + CYAN,
         range(0, 5): NORMAL + CYAN,
@@ -75,7 +241,7 @@ class WeatherReport(object):
         range(35, 99): BRIGHT + RED
     }
 
-    def __init__(self, token: str, location: str, unit_system: str, mode: Mode=Mode.TODAY, hour: int=3) -> WeatherReport:
+    def __init__(self, token: str, location: str, unit_system: str, mode: Mode=Mode.TODAY, hour: int=3, weather_manager: Optional[WeatherManager]=None, cache: Optional[ResponseCache]=None, max_age: Optional[float]=None, at: Optional[float]=None, interpolate: bool=False, hooks: Optional[Sequence[profiling.Hook]]=None, locations: Optional[LocationIndex]=None) -> WeatherReport:
         self.token = token
         self.location = location.capitalize()
         self.unit_system = unit_system.upper()
@@ -85,37 +251,168 @@ def __init__(self, token: str, location: str, unit_system: str, mode: Mode=Mode.
             raise ValueError("%d must be evenly divisible by 3." % hour)
 
         self.hour = hour
+        self.at = at
+        self.interpolate = interpolate
+        self.weather_manager = weather_manager
+        self.cache = cache
+        self.max_age = CACHE_TTL[self.mode.value] if max_age is None else max_age
+        self.hooks: List[profiling.Hook] = list(hooks or [])
+        self.locations = locations
+        self._snapshot: Optional[Snapshot] = None
 
 
     def __repr__(self) -> str:
         return f"{self.__class__.__name__}(LOCATION={self.location})"
 
+    @classmethod
+    def from_observation(cls, token: str, observation: Observation, unit_system: str, timestamp: Optional[float]=None) -> WeatherReport:
+        """
+        Create a report for today's weather from an `observation` that was
+        already fetched, e.g. as part of a bulk request.
+        """
+        report = cls(token, observation.location.name, unit_system, Mode.TODAY)
+        report.location = observation.location.name
+        report._snapshot = report._make_snapshot(observation, timestamp or time.time())
+        return report
+
     @property
-    def observation(self) -> Observation:
-        weather_manager = pyowm.OWM(self.token).weather_manager()
+    def cache_key(self) -> Tuple[str, str, str]:
+        # tomorrow and forecast mode share the same 3h forecast response
+        return (self.location, Mode.TODAY.value if self.mode == Mode.TODAY else Mode.TOMORROW.value, self.unit_system)
+
+    def _make_snapshot(self, observation: Observation, timestamp: float, forecast: Optional[ForecastIndex]=None) -> Snapshot:
+        today = dt.fromtimestamp(timestamp, tz=timezone.utc)
+
         if self.mode == Mode.TODAY:
-            return weather_manager.weather_at_place(self.location)
+            return Snapshot(observation, observation.weather, today, timestamp)
+
+        forecast = forecast or ForecastIndex(observation.forecast.weathers)
+
+        if self.mode == Mode.FORECAST and self.at is None:
+            weather = forecast.weathers[0] if forecast.weathers else None
+            return Snapshot(observation, weather, dt.fromtimestamp(weather.ref_time, tz=timezone.utc) if weather else today, timestamp, forecast)
+
+        if self.at is not None:
+            if not forecast.covers(self.at):
+                utc = lambda timestamp: dt.fromtimestamp(timestamp, tz=timezone.utc).strftime('%Y-%m-%d %H:%M UTC')
+                window = f" ({utc(forecast.times[0])} to {utc(forecast.times[-1])})" if forecast.times else ''
+                raise ValueError("%s is outside of the forecast for %s%s." % (utc(self.at), self.location, window))
+            datetime = dt.fromtimestamp(self.at, tz=timezone.utc)
         else:
-            return weather_manager.forecast_at_place(self.location, '3h')
+            tomorrow = (today + timedelta(hours=12)).date() + timedelta(days=1)
+            datetime = dt(tomorrow.year, tomorrow.month, tomorrow.day, self.hour, tzinfo=timezone.utc)
+
+        weather = forecast.interpolate(datetime.timestamp()) if self.interpolate else forecast.nearest(datetime.timestamp())
+        if self.at is None:
+            datetime = today + timedelta(hours=12)
+        elif not self.interpolate:
+            # the nearest slot describes its own time, not the requested one
+            datetime = dt.fromtimestamp(weather.ref_time, tz=timezone.utc)
+        return Snapshot(observation, weather, datetime, timestamp, forecast)
+
+    def project(self, at: float, interpolate: Optional[bool]=None) -> WeatherReport:
+        """
+        Return a report for the forecast slot nearest to (or interpolated at)
+        the timestamp `at` that reuses this report's forecast, so that several
+        horizons cost a single request. Raises `ValueError` if `at` is more
+        than one slot outside of the forecast.
+        """
+        report = WeatherReport(self.token, self.location, self.unit_system, Mode.TOMORROW, self.hour, self.weather_manager, self.cache, self.max_age, at, self.interpolate if interpolate is None else interpolate, self.hooks, self.locations)
+        snapshot = self.snapshot if self.mode != Mode.TODAY else None
+        if snapshot is not None:
+            report._snapshot = report._make_snapshot(snapshot.observation, snapshot.timestamp, snapshot.forecast)
+        return report
+
+    def slots(self) -> List[WeatherReport]:
+        """
+        Return one report for every slot of the 3h forecast (up to 5 days) from a single request.
+        """
+        snapshot = self.snapshot if self.mode != Mode.TODAY else self.project(time.time()).snapshot
+        return [self.project(timestamp, interpolate=False) for timestamp in snapshot.forecast.times]
+
+    def refresh(self) -> Snapshot:
+        """
+        Fetch a new observation (or forecast) from OpenWeather and replace the
+        current snapshot. Concurrent refreshes of the same response share a
+        single request, across threads and (with a cache) across processes.
+        """
+        timestamp, observation = flights.do(self.cache_key, self._fetch)
+        self._snapshot = self._make_snapshot(observation, timestamp)
+        return self._snapshot
+
+    def _fetch(self) -> Tuple[float, Observation]:
+        if self.cache is None:
+            observation = self._request()
+            return time.time(), observation
+
+        # other processes wait on the lock file for this response and then
+        # read it from the cache instead of sending the same request
+        started = time.time()
+        with utils.file_lock(repr(self.cache_key)):
+            if (cached := self.cache.get(self.cache_key, time.time() - started)) is not None:
+                return cached
+
+            observation = self._request()
+            timestamp = time.time()
+            self.cache.set(self.cache_key, observation, created=timestamp)
+
+        return timestamp, observation
+
+    def _request(self) -> Observation:
+        with profiling.span('fetch', self.hooks, location=self.location, mode=self.mode.value):
+            with profiling.span('import pyowm'):
+                from .client import get_weather_manager, resolves_locations
+            weather_manager = self.weather_manager or get_weather_manager(self.token)
+            locations = self.locations if resolves_locations() else None
+
+            if (city := locations.resolve(self.location) if locations is not None else None) is not None:
+                return weather_manager.weather_at_id(city.id) if self.mode == Mode.TODAY else weather_manager.forecast_at_id(city.id, '3h')
+
+            if self.mode == Mode.TODAY:
+                observation = weather_manager.weather_at_place(self.location)
+                location = observation.location
+            else:
+                observation = weather_manager.forecast_at_place(self.location, '3h')
+                location = observation.forecast.location
+
+            if locations is not None:
+                locations.learn(self.location, City.from_location(location))
+
+            return observation
+
+    def _load_cached(self) -> Optional[Snapshot]:
+        if self._snapshot is None and self.cache is not None:
+            with profiling.span('cache', self.hooks, location=self.location) as attributes:
+                cached = self.cache.get(self.cache_key, self.max_age)
+                attributes['hit'] = cached is not None
+            if cached is not None:
+                self._snapshot = self._make_snapshot(cached[1], cached[0])
+
+        return self._snapshot
+
+    @property
+    def snapshot(self) -> Snapshot:
+        """
+        Return the current snapshot. On first access, a cached response younger
+        than `max_age` is used if available, else OpenWeather is queried.
+        """
+        return self._load_cached() or self.refresh()
+
+    @property
+    def observation(self) -> Observation:
+        return self.snapshot.observation
 
     @property
     def datetime(self) -> dt:
-        today = dt.today().astimezone(tz=timezone.utc)
-        return today if self.mode == Mode.TODAY else today + timedelta(hours=12)
+        return self.snapshot.datetime
 
     @property
     def weather(self) -> Weather:
-        if self.mode == Mode.TODAY:
-            return self.observation.weather
-        else:
-            for weather in self.observation.forecast.weathers:
-                ref_time = dt.fromtimestamp(weather.ref_time, tz=timezone.utc)
-                if (ref_time.day > self.datetime.day and ref_time.hour == self.hour):
-                    return weather
+        return self.snapshot.weather
 
     @property
-    def temperature(self):
-        return self.weather.temperature(WeatherReport._temperature_units[self.unit_system.upper()])
+    def temperature(self) -> dict:
+        return {key: round(units.kelvin_to(self.weather.temp[key], self.unit_system), 2) for key in ('temp', 'temp_min', 'temp_max')}
 
     @property
     def temperature_min(self) -> float:
@@ -131,7 +428,7 @@ def temperature_max(self) -> float:
 
     @property
     def speed(self) -> float:
-        return self.weather.wind(WeatherReport._speed_units[self.unit_system.upper()])['speed']
+        return units.speed_from_si(self.weather.wnd['speed'], self.unit_system)
 
     @property
     def humidity(self) -> int:
@@ -146,48 +443,107 @@ def get_temperature_string(temperature: float, unit_system: str,) -> str:
         """
         Format the temperature using the passed unit system.
         """
-        ensure_celsius = lambda temperature: (temperature - 32) / 1.8 if unit_system.upper() == 'IMPERIAL' else temperature
-        temperature_string = "{:5.2F}{}C".format(temperature, u'\N{DEGREE SIGN}') if unit_system == 'SI' else "{:6.2F}{}F".format(temperature, u'\N{DEGREE SIGN}')
-        return [f"{color}{temperature_string}{RESET_ALL}" for key, color in WeatherReport._color_map.items() if int(ensure_celsius(temperature)) in key][0]
+        celsius = units.convert_temperature(temperature, unit_system, 'SI')
+        temperature_string = ("{:5.2F}{}{}" if unit_system.upper() == 'SI' else "{:6.2F}{}{}").format(temperature, u'\N{DEGREE SIGN}', units.TEMPERATURE_SYMBOLS[unit_system.upper()])
+        return [f"{color}{temperature_string}{RESET_ALL}" for key, color in WeatherReport._color_map.items() if int(celsius) in key][0]
 
     @staticmethod
     def get_wind_string(speed: float, unit_system: str) -> str:
         """
         Format the wind speed using the passed unit system.
         """
-        return "{:5.2F}m/s".format(speed) if unit_system == 'SI' else f"{speed}mph"
+        return "{:5.2F}{}".format(speed, units.SPEED_SYMBOLS[unit_system.upper()])
+
+    def record(self) -> ReportRecord:
+        """
+        Return the raw values of this report, computed once from the snapshot
+        and timed as `export` span.
+        """
+        temperature = self.temperature
+        with profiling.span('export', self.hooks, location=self.location):
+            return ReportRecord(
+                self.datetime.timestamp(),
+                self.location,
+                self.unit_system,
+                temperature['temp_min'],
+                temperature['temp'],
+                temperature['temp_max'],
+                self.speed,
+                self.humidity,
+                self.cloud_coverage
+            )
 
     def build(self) -> dict:
         """
         Return a dictionary with pre-formatted strings.
         """
-        padded_percentage = "{:5}%".format
-        return {
-            'Date': self.datetime,
-            'Location': self.location,
-            'UnitSystem': self.unit_system,
-            'TemperatureMin': WeatherReport.get_temperature_string(self.temperature_min, self.unit_system),
-            'TemperatureNow': WeatherReport.get_temperature_string(self.temperature_now, self.unit_system),
-            'TemperatureMax': WeatherReport.get_temperature_string(self.temperature_max, self.unit_system),
-            'WindSpeed': WeatherReport.get_wind_string(self.speed, self.unit_system),
-            'Humidity': padded_percentage(self.humidity),
-            'CloudCoverage': padded_percentage(self.weather.clouds)
-        }
+        return self.record().format(self.hooks)
 
     def export(self) -> List[str]:
         """
         Return a list of data points fit for processing by other applications.
         """
-        return list(map(str, [
-            self.datetime.timestamp(),
-            self.location,
-            self.unit_system,
-            self.temperature_min,
-            self.temperature_now,
-            self.temperature_max,
-            self.speed,
-            self.humidity,
-            self.cloud_coverage
-        ]))
+        return list(map(str, self.record()))
+
+def fetch_reports(reports: Iterable[WeatherReport], concurrency: int=8, refresh: bool=False, ordered: bool=True) -> Iterator[Tuple[WeatherReport, Optional[Exception]]]:
+    """
+    Fetch the snapshots of all `reports` on a bounded thread pool and yield
+    each report alongside the exception it raised (if any) in input order,
+    or as soon as it is fetched if `ordered` is false. If `refresh` is set,
+    reports that already have a snapshot fetch a new one.
+    """
+    def fetch(report: WeatherReport) -> Optional[Exception]:
+        try:
+            report.refresh() if refresh else report.snapshot
+        except Exception as error:
+            return error
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        reports = list(reports)
+        if ordered:
+            yield from zip(reports, executor.map(fetch, reports))
+            return
+        futures = {executor.submit(fetch, report): report for report in reports}
+        yield from ((futures[future], future.result()) for future in as_completed(futures))
+
+def project_reports(results: Iterable[Tuple[WeatherReport, Optional[Exception]]], timestamps: Optional[List[float]]=None, interpolate: bool=False) -> Iterator[Tuple[WeatherReport, Optional[Exception]]]:
+    """
+    Expand every successfully fetched report into one report per timestamp
+    (see `WeatherReport.project`), or per forecast slot if `timestamps` is
+    omitted, and pass failed reports through unchanged. Timestamps outside
+    of the forecast yield the report with a `ValueError`.
+    """
+    for report, error in results:
+        if error is not None:
+            yield report, error
+            continue
+        if timestamps is None:
+            yield from ((projection, None) for projection in report.slots())
+            continue
+        for timestamp in timestamps:
+            try:
+                projection, error = report.project(timestamp, interpolate), None
+            except ValueError as out_of_range:
+                projection, error = report, out_of_range
+            yield projection, error
+
+def bulk_reports(token: str, unit_system: str, bbox: Optional[Tuple[float, float, float, float]]=None, city_ids: Optional[List[int]]=None, weather_manager: Optional[WeatherManager]=None) -> List[WeatherReport]:
+    """
+    Return today's reports for all cities inside `bbox` (lon_left, lat_bottom,
+    lon_right, lat_top) or in `city_ids` with one request per query instead of
+    one per city. OpenWeather's group endpoint accepts up to 20 IDs at a time.
+    """
+    from .client import get_weather_manager
+    weather_manager = weather_manager or get_weather_manager(token)
+    observations = []
+
+    if bbox is not None:
+        observations += weather_manager.weather_at_places_in_bbox(*bbox) or []
+
+    for offset in range(0, len(city_ids or []), GROUP_SIZE):
+        observations += weather_manager.weather_at_ids(city_ids[offset:offset + GROUP_SIZE]) or []
+
+    timestamp = time.time()
+    return [WeatherReport.from_observation(token, observation, unit_system, timestamp) for observation in observations]
 
 #endregion weather interface
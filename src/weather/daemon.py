@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from datetime import datetime as dt
+from datetime import timezone
+from http.client import HTTPConnection
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+from . import profiling, utils
+from .cache import ResponseCache
+from .config import CACHE_TTL, DAEMONFILE
+from .core import Mode, ReportRecord, WeatherReport
+from .locations import LocationIndex
+
+#region server
+
+ERROR_STATUS = {'UnauthorizedError': 401, 'NotFoundError': 404}
+
+class ReportServer(ThreadingHTTPServer):
+    """
+    Local HTTP server that keeps warm weather reports in memory and serves
+    them as JSON on `GET /report?location=...&mode=...&unit_system=...&hour=...`.
+    """
+    daemon_threads = True
+
+    def __init__(self, token: str, host: str='127.0.0.1', port: int=0, cache: Optional[ResponseCache]=None, locations: Optional[LocationIndex]=None) -> ReportServer:
+        super().__init__((host, port), ReportRequestHandler)
+        self.token = token
+        self.cache = cache
+        self.locations = locations
+        self.lock = threading.Lock()
+        self.reports: Dict[Tuple[str, str, str, Optional[int]], WeatherReport] = dict()
+
+    def get_report(self, location: str, mode: Mode, unit_system: str, hour: int, max_age: Optional[float]=None) -> WeatherReport:
+        """
+        Return the in-memory report for these parameters and refresh its
+        snapshot once it is older than `max_age` (defaults to the mode's TTL).
+        """
+        # the hour only selects a forecast slot, so all of today's queries share one report
+        key = (location.capitalize(), mode.value, unit_system.upper(), None if mode == Mode.TODAY else hour)
+        with self.lock:
+            if key not in self.reports:
+                self.reports[key] = WeatherReport(self.token, location, unit_system, mode, hour, cache=self.cache, locations=self.locations)
+            report = self.reports[key]
+
+        if time.time() - report.snapshot.timestamp > (CACHE_TTL[mode.value] if max_age is None else max_age):
+            report.refresh()
+
+        return report
+
+    def poll(self, locations: List[str], unit_system: str, interval: float, stop: threading.Event) -> None:
+        """
+        Refresh today's report for all `locations` every `interval` seconds until `stop` is set.
+        """
+        while not stop.is_set():
+            started = time.time()
+            for location in locations:
+                try:
+                    self.get_report(location, Mode.TODAY, unit_system, 3, max_age=interval)
+                except Exception as error:
+                    utils.logger.error("Failed to poll %s: %s" % (location, error))
+            stop.wait(max(0, interval - (time.time() - started)))
+
+class ReportRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def send_json(self, status: int, body: dict) -> None:
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+
+        if url.path == '/health':
+            return self.send_json(200, {'pid': os.getpid()})
+        if url.path != '/report':
+            return self.send_json(404, {'error': 'NotFound', 'message': url.path})
+
+        params = dict(parse_qsl(url.query))
+        try:
+            report = self.server.get_report(params['location'], Mode(params.get('mode', 'today')), params.get('unit_system', 'SI'), int(params.get('hour', 15)))
+            data = report.build()
+            data['Date'] = data['Date'].timestamp()
+            self.send_json(200, {'build': data, 'export': report.export()})
+        except Exception as error:
+            self.send_json(ERROR_STATUS.get(type(error).__name__, 500), {'error': type(error).__name__, 'message': str(error)})
+
+def serve(token: str, locations: List[str], unit_system: str, interval: float=CACHE_TTL['today'], host: str='127.0.0.1', port: int=0) -> None:
+    """
+    Run the report server in the foreground and announce its address in the
+    config directory, so that `weather report` can find it.
+    """
+    server = ReportServer(token, host, port, cache=ResponseCache(), locations=LocationIndex())
+    stop = threading.Event()
+    poller = threading.Thread(target=server.poll, args=(locations, unit_system, interval, stop), daemon=True)
+    daemon_file = utils.get_resource_path(DAEMONFILE)
+
+    # translate termination requests (e.g. from a service manager) into a clean shutdown
+    signal.signal(signal.SIGTERM, lambda *args: sys.exit(0))
+
+    try:
+        with open(daemon_file, mode='w', encoding='utf-8') as file_handler:
+            json.dump({'pid': os.getpid(), 'host': server.server_address[0], 'port': server.server_address[1]}, file_handler)
+        poller.start()
+        utils.print_on_success("Serving weather reports on http://%s:%d" % server.server_address[:2])
+        server.serve_forever()
+    finally:
+        stop.set()
+        server.server_close()
+        daemon_file.unlink(missing_ok=True)
+
+#endregion server
+
+#region client
+
+class DaemonClient(object):
+    """
+    Queries a running report server.
+    """
+    def __init__(self, host: str, port: int, timeout: float=10) -> DaemonClient:
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(ADDRESS={self.host}:{self.port})"
+
+    def get_json(self, path: str, timeout: Optional[float]=None) -> Tuple[int, dict]:
+        connection = HTTPConnection(self.host, self.port, timeout=timeout or self.timeout)
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            connection.close()
+
+    def ping(self) -> bool:
+        try:
+            return self.get_json('/health', timeout=0.25)[0] == 200
+        except OSError:
+            return False
+
+def connect() -> Optional[DaemonClient]:
+    """
+    Return a client for the running report server, or `None` if there is none.
+    """
+    daemon_file = utils.get_config_dir().joinpath(DAEMONFILE)
+    try:
+        with open(daemon_file, mode='r', encoding='utf-8') as file_handler:
+            info = json.load(file_handler)
+    except (OSError, ValueError):
+        return None
+
+    client = DaemonClient(info['host'], info['port'])
+    return client if client.ping() else None
+
+class RemoteReport(object):
+    """
+    Mirrors the `build` and `export` interface of `WeatherReport` for reports
+    served by a running report server.
+    """
+    def __init__(self, client: DaemonClient, location: str, unit_system: str, mode: Mode=Mode.TODAY, hour: int=3) -> RemoteReport:
+        self.client = client
+        self.location = location.capitalize()
+        self.unit_system = unit_system.upper()
+        self.mode = mode
+        self.hour = hour
+        self._snapshot: Optional[dict] = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(LOCATION={self.location})"
+
+    @property
+    def snapshot(self) -> dict:
+        if self._snapshot is None:
+            params = {'location': self.location, 'mode': self.mode.value, 'unit_system': self.unit_system}
+            if self.mode != Mode.TODAY:
+                params['hour'] = self.hour
+            query = urlencode(params)
+            with profiling.span('fetch', location=self.location, mode=self.mode.value, server=f"{self.client.host}:{self.client.port}") as attributes:
+                status, body = self.client.get_json(f"/report?{query}")
+                attributes['status'] = status
+
+            if status != 200:
+                from pyowm.commons import exceptions
+                raise getattr(exceptions, body['error'], RuntimeError)(body['message'])
+
+            self._snapshot = body
+        return self._snapshot
+
+    def build(self) -> dict:
+        data = dict(self.snapshot['build'])
+        data['Date'] = dt.fromtimestamp(data['Date'], tz=timezone.utc)
+        return data
+
+    def export(self) -> List[str]:
+        return self.snapshot['export']
+
+    def record(self) -> ReportRecord:
+        row = self.export()
+        with profiling.span('export', location=self.location):
+            return ReportRecord.from_row(row)
+
+#endregion client
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+import csv
+import struct
+from json.encoder import encode_basestring_ascii
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, TextIO
+
+from .core import ReportRecord
+from .storage import FIELDNAMES
+
+#region record export
+
+# All writers stream report records to an open file as they arrive and
+# return the number of records written. Values are written as they are,
+# without formatting them for display first. Text writers optionally flush
+# after every record, so that a pipeline receives each one without delay.
+
+UNIT_SYSTEMS = ('SI', 'IMPERIAL')
+
+BINARY_MAGIC = b'WRR1'
+# date, unit system, minimum/current/maximum temperature, wind speed, humidity,
+# cloud coverage and the length of the UTF-8 encoded location that follows
+BINARY_RECORD = struct.Struct('<dB4dBBH')
+
+NDJSON_TEMPLATE = '{{' + ', '.join(f'"{name}": {{}}' for name in FIELDNAMES) + '}}\n'
+
+def write_csv(records: Iterable[ReportRecord], file: TextIO, header: bool=True, flush: bool=False) -> int:
+    """
+    Write `records` as CSV with the columns of saved reports.
+    """
+    writer = csv.writer(file, delimiter=',', lineterminator='\n')
+    if header:
+        writer.writerow(FIELDNAMES)
+    count = 0
+    for record in records:
+        writer.writerow(record)
+        count += 1
+        if flush:
+            file.flush()
+    return count
+
+def format_json(record: ReportRecord) -> str:
+    """
+    Return `record` as a single-line JSON object keyed by the columns of saved reports.
+    """
+    date, location, unit_system, *values = record
+    return NDJSON_TEMPLATE.format(date, encode_basestring_ascii(location), encode_basestring_ascii(unit_system), *values)
+
+def write_ndjson(records: Iterable[ReportRecord], file: TextIO, flush: bool=False) -> int:
+    """
+    Write `records` as JSON lines, one object per record.
+    """
+    count = 0
+    for record in records:
+        file.write(format_json(record))
+        count += 1
+        if flush:
+            file.flush()
+    return count
+
+def write_json(records: Iterable[ReportRecord], file: TextIO, flush: bool=False) -> int:
+    """
+    Write `records` as a single JSON array with one object per line.
+    """
+    count = 0
+    for record in records:
+        file.write(('[' if count == 0 else ',') + format_json(record))
+        count += 1
+        if flush:
+            file.flush()
+    file.write('[]\n' if count == 0 else ']\n')
+    return count
+
+def write_binary(records: Iterable[ReportRecord], file: BinaryIO) -> int:
+    """
+    Write `records` in a compact binary format (see `BINARY_RECORD`) that `read_binary` reads back.
+    """
+    pack = BINARY_RECORD.pack
+    file.write(BINARY_MAGIC)
+    count = 0
+    for date, location, unit_system, *values in records:
+        location = location.encode('utf-8')
+        file.write(pack(date, UNIT_SYSTEMS.index(unit_system), *values, len(location)) + location)
+        count += 1
+    return count
+
+def read_binary(file: BinaryIO) -> Iterator[ReportRecord]:
+    """
+    Lazily yield the records of a file written by `write_binary`.
+    """
+    if file.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+        raise ValueError("%s is not a binary report export." % getattr(file, 'name', file))
+    while header := file.read(BINARY_RECORD.size):
+        date, unit_system, *values, length = BINARY_RECORD.unpack(header)
+        yield ReportRecord(date, file.read(length).decode('utf-8'), UNIT_SYSTEMS[unit_system], *values)
+
+EXPORT_FORMATS: Dict[str, Callable[..., int]] = {'csv': write_csv, 'json': write_json, 'ndjson': write_ndjson, 'binary': write_binary}
+# formats that can be written to the terminal
+TEXT_FORMATS = ('json', 'ndjson', 'csv')
+
+#endregion record export
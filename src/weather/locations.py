@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+import bz2
+import difflib
+import importlib.util
+import sqlite3
+import threading
+import unicodedata
+from pathlib import Path
+from typing import (TYPE_CHECKING, Iterator, List, NamedTuple, Optional, Tuple,
+                    Union)
+
+from . import utils
+from .config import LOCATIONDB
+
+if TYPE_CHECKING:
+    from pyowm.weatherapi25.location import Location
+
+#region location index
+
+# PyOWM's registry lists US cities by state code instead of `US`
+US_ALIASES = ('US', 'USA')
+US_STATES = frozenset((
+    'AK', 'AL', 'AR', 'AZ', 'CA', 'CO', 'CT', 'DC', 'DE', 'FL', 'GA', 'HI', 'IA',
+    'ID', 'IL', 'IN', 'KS', 'KY', 'LA', 'MA', 'MD', 'ME', 'MI', 'MN', 'MO', 'MS',
+    'MT', 'NC', 'ND', 'NE', 'NH', 'NJ', 'NM', 'NV', 'NY', 'OH', 'OK', 'OR', 'PA',
+    'RI', 'SC', 'SD', 'TN', 'TX', 'UT', 'VA', 'VT', 'WA', 'WI', 'WV', 'WY'
+))
+
+def in_us(country: str, lat: float, lon: float) -> bool:
+    """
+    Return whether a registry entry is a US city. Most state codes are also
+    country codes (e.g. DE, CA, GA), which the coordinates tell apart: the US
+    lie north of 17°N and west of 60°W (or east of 170°E for the Aleutians),
+    and California south of the Canadian border.
+    """
+    return country in US_STATES and lat > 17 and (lon < -60 or lon > 170) and (country != 'CA' or lat < 42.1)
+
+class City(NamedTuple):
+    id: int
+    name: str
+    country: str
+    lat: float
+    lon: float
+
+    @classmethod
+    def from_location(cls, location: Location) -> City:
+        return cls(location.id, location.name, location.country, location.lat, location.lon)
+
+    @property
+    def query(self) -> str:
+        """
+        Return the OpenWeather query for this city (`Name,CC` or `Name,ST,US`).
+        """
+        return f"{self.name},{self.country},US" if in_us(self.country, self.lat, self.lon) else f"{self.name},{self.country}"
+
+def normalize(name: str) -> str:
+    """
+    Return a case- and accent-insensitive search key for `name`.
+    """
+    return unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii').strip().lower()
+
+def split_query(query: str) -> Tuple[str, Optional[str]]:
+    """
+    Split an OpenWeather-style query like `Berlin,DE` or `Albany,NY,US` into
+    its name and country (or US state) code.
+    """
+    name, *codes = (part.strip() for part in query.split(','))
+    codes = [code.upper() for code in codes if code]
+    if len(codes) > 1 and codes[-1] in US_ALIASES:
+        return name, codes[0]
+    return name, codes[0] if codes else None
+
+def read_registry() -> Iterator[Tuple[int, str, str, float, float, str]]:
+    """
+    Lazily yield all cities of the city ID registry that ships with PyOWM.
+    """
+    # located without importing PyOWM, which is slow to import
+    registry = Path(importlib.util.find_spec('pyowm').origin).parent.joinpath('commons', 'cityids')
+    for path in sorted(registry.glob('*.txt.bz2')):
+        with bz2.open(path, mode='rt', encoding='utf-8') as file_handler:
+            for line in file_handler:
+                # some names contain a comma, so split from the right
+                name, city_id, lat, lon, country = line.rstrip('\n').rsplit(',', 4)
+                yield int(city_id), name, normalize(name), float(lat), float(lon), country
+
+class LocationIndex(object):
+    """
+    SQLite index that resolves free-text locations to OpenWeather city IDs, so
+    that reports query by ID instead of letting OpenWeather guess the city on
+    every request. Resolutions come from the city ID registry (once it is
+    built with `build`) and from locations that OpenWeather already resolved.
+    """
+    def __init__(self, path: Optional[Union[str, Path]]=None) -> LocationIndex:
+        self.path = Path(path) if path else utils.get_resource_path(LOCATIONDB)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        self.connection.create_function('in_us', 3, in_us)
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS cities (
+                    id INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    lat REAL NOT NULL,
+                    lon REAL NOT NULL,
+                    country TEXT NOT NULL
+                )
+            """)
+            self.connection.execute("CREATE INDEX IF NOT EXISTS cities_key ON cities (key)")
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS resolved (
+                    query TEXT PRIMARY KEY,
+                    id INTEGER NOT NULL,
+                    name TEXT NOT NULL,
+                    country TEXT NOT NULL,
+                    lat REAL NOT NULL,
+                    lon REAL NOT NULL
+                )
+            """)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(PATH={self.path})"
+
+    def __enter__(self) -> LocationIndex:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    @property
+    def built(self) -> bool:
+        with self.lock:
+            return self.connection.execute("SELECT 1 FROM cities LIMIT 1").fetchone() is not None
+
+    def build(self) -> int:
+        """
+        (Re)import the city ID registry and return the number of cities.
+        """
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM cities")
+            self.connection.executemany("INSERT OR REPLACE INTO cities VALUES (?, ?, ?, ?, ?, ?)", read_registry())
+            return self.connection.execute("SELECT COUNT(*) FROM cities").fetchone()[0]
+
+    def _select(self, where: str, params: tuple, country: Optional[str], limit: int) -> List[City]:
+        if limit <= 0:
+            return []
+        if country in US_ALIASES:
+            where = f"{where} AND in_us(country, lat, lon)"
+        elif country:
+            where, params = f"{where} AND country = ?", (*params, country)
+        with self.lock:
+            rows = self.connection.execute(f"SELECT id, name, country, lat, lon FROM cities WHERE {where} ORDER BY key, name, country LIMIT ?", (*params, limit)).fetchall()
+        return [City(*row) for row in rows]
+
+    def search(self, query: str, limit: int=10) -> List[City]:
+        """
+        Return up to `limit` cities matching `query` (optionally `Name,CC`):
+        exact matches first, then names starting with it, then similar names.
+        """
+        name, country = split_query(query)
+        key = normalize(name)
+        if not key:
+            return []
+
+        cities = self._select("key = ?", (key,), country, limit)
+        cities += self._select("key > ? AND key < ?", (key, key + '\uffff'), country, limit - len(cities))
+
+        if len(cities) < limit:
+            # only names with the same first letter are compared, which keeps this fast
+            with self.lock:
+                keys = [row[0] for row in self.connection.execute("SELECT DISTINCT key FROM cities WHERE key >= ? AND key < ?", (key[0], key[0] + '\uffff'))]
+            for match in difflib.get_close_matches(key, keys, n=limit, cutoff=0.75):
+                if not match.startswith(key):
+                    cities += self._select("key = ?", (match,), country, limit - len(cities))
+
+        return cities[:limit]
+
+    def resolve(self, query: str) -> Optional[City]:
+        """
+        Return the city for `query` if it is unambiguous, else `None`.
+        """
+        with self.lock:
+            row = self.connection.execute("SELECT id, name, country, lat, lon FROM resolved WHERE query = ?", (normalize(query),)).fetchone()
+        if row is not None:
+            return City(*row)
+
+        name, country = split_query(query)
+        cities = self._select("key = ?", (normalize(name),), country, 2)
+        return cities[0] if len(cities) == 1 else None
+
+    def learn(self, query: str, city: City) -> None:
+        """
+        Remember that OpenWeather resolved `query` to `city`.
+        """
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO resolved VALUES (?, ?, ?, ?, ?, ?)", (normalize(query), *city))
+
+#endregion location index
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Union
+
+#region profiling
+
+@dataclass(frozen=True)
+class Span:
+    """
+    A timed phase of the program, e.g. an HTTP request or building a report.
+    `start` is measured in seconds on the `time.perf_counter` clock.
+    """
+    name: str
+    start: float
+    duration: float
+    thread: int = field(default_factory=threading.get_ident)
+    attributes: dict = field(default_factory=dict)
+
+Hook = Callable[[Span], None]
+
+# hooks of the span that is currently open in this thread (or task), so that
+# nested spans (e.g. the HTTP request of a report) reach the same callbacks
+_active_hooks: ContextVar[Sequence[Hook]] = ContextVar('active_hooks', default=())
+
+class Profiler(object):
+    """
+    Collects spans while `enabled` and passes every span to the registered
+    hooks, even if collecting is disabled.
+    """
+    def __init__(self, enabled: bool=False) -> Profiler:
+        self.enabled = enabled
+        self.origin = time.perf_counter()
+        self.spans: List[Span] = []
+        self.hooks: List[Hook] = []
+        self.output: Optional[Path] = None
+        self.lock = threading.Lock()
+        self._cprofile = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(ENABLED={self.enabled}, SPANS={len(self.spans)})"
+
+    def enable(self, output: Optional[Union[str, Path]]=None) -> None:
+        """
+        Start collecting spans. If `output` is set, `dump` writes a Chrome
+        trace (`*.json`) or runs cProfile and writes its statistics (any other
+        extension, e.g. `*.prof`) to this file.
+        """
+        self.enabled = True
+        self.output = Path(output) if output else None
+        if self.output is not None and self.output.suffix != '.json':
+            import cProfile
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def add_hook(self, hook: Hook) -> None:
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook: Hook) -> None:
+        self.hooks.remove(hook)
+
+    def record(self, span: Span, hooks: Sequence[Hook]=()) -> None:
+        if self.enabled:
+            with self.lock:
+                self.spans.append(span)
+        for hook in (*self.hooks, *hooks):
+            hook(span)
+
+    @contextmanager
+    def span(self, name: str, hooks: Optional[Sequence[Hook]]=None, **attributes) -> Iterator[dict]:
+        """
+        Time the enclosed block as span `name`. The yielded `attributes` may be
+        extended inside the block (e.g. with the size of a response). `hooks`
+        receive this span and all spans nested inside it.
+        """
+        active = _active_hooks.get()
+        hooks = (*active, *(hook for hook in hooks or () if hook not in active))
+        if not (self.enabled or self.hooks or hooks):
+            yield attributes
+            return
+
+        token = _active_hooks.set(hooks)
+        start = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            duration = time.perf_counter() - start
+            _active_hooks.reset(token)
+            self.record(Span(name, start, duration, attributes=attributes), hooks)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Return the count, total and maximum duration of all spans by name in order of first appearance.
+        """
+        summary: Dict[str, Dict[str, float]] = dict()
+        for span in self.spans:
+            entry = summary.setdefault(span.name, {'count': 0, 'total': 0.0, 'max': 0.0})
+            entry['count'] += 1
+            entry['total'] += span.duration
+            entry['max'] = max(entry['max'], span.duration)
+        return summary
+
+    def dump(self) -> Optional[Path]:
+        """
+        Write the collected profile to `output` (see `enable`) and return its path.
+        """
+        if self.output is None:
+            return None
+
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.output)
+            return self.output
+
+        events = [
+            {
+                'name': span.name,
+                'cat': 'weather',
+                'ph': 'X',
+                'ts': (span.start - self.origin) * 1e6,
+                'dur': span.duration * 1e6,
+                'pid': 0,
+                'tid': span.thread,
+                'args': {key: str(value) for key, value in span.attributes.items()}
+            }
+            for span in self.spans
+        ]
+        with open(self.output, mode='w', encoding='utf-8') as file_handler:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file_handler)
+        return self.output
+
+profiler = Profiler()
+span = profiler.span
+
+#endregion profiling
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Tuple, Union
+from urllib.parse import parse_qsl, urlparse
+
+import requests
+from pyowm.commons import exceptions
+
+from . import utils
+from .client import PooledHttpClient
+
+#region record and replay
+
+IGNORED_PARAMS = ('APPID', 'lang')
+
+def fixture_name(path: str, params: Optional[dict]=None) -> str:
+    """
+    Return a stable file name for the response to `path` with query `params`
+    (the API key and language are ignored).
+    """
+    query = sorted((key, str(value)) for key, value in (params or dict()).items() if key not in IGNORED_PARAMS)
+    digest = hashlib.sha1(json.dumps([path, query]).encode('utf-8')).hexdigest()[:16]
+    return f"{path.replace('/', '_')}-{digest}.json"
+
+class RecordingHttpClient(PooledHttpClient):
+    """
+    Passes every request through to OpenWeather and stores the raw response in `directory`.
+    """
+    def __init__(self, api_key: str, config: dict, root_uri: str, session: requests.Session, directory: Union[str, Path], **kwargs) -> RecordingHttpClient:
+        super().__init__(api_key, config, root_uri, session, **kwargs)
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def request(self, path: str, params: Optional[dict]=None, headers: Optional[dict]=None) -> Tuple[int, str]:
+        status_code, text = super().request(path, params, headers)
+        fixture = {'path': path, 'params': {key: value for key, value in (params or dict()).items() if key not in IGNORED_PARAMS}, 'status': status_code, 'body': text}
+        with open(self.directory.joinpath(fixture_name(path, params)), mode='w', encoding='utf-8') as file_handler:
+            json.dump(fixture, file_handler, indent=2)
+        return status_code, text
+
+class ReplayHttpClient(PooledHttpClient):
+    """
+    Answers every request from the fixtures in `directory` without touching the network.
+    """
+    def __init__(self, api_key: str, config: dict, root_uri: str, directory: Union[str, Path]) -> ReplayHttpClient:
+        super().__init__(api_key, config, root_uri, session=None)
+        self.directory = Path(directory)
+
+    def request(self, path: str, params: Optional[dict]=None, headers: Optional[dict]=None) -> Tuple[int, str]:
+        try:
+            with open(self.directory.joinpath(fixture_name(path, params)), mode='r', encoding='utf-8') as file_handler:
+                fixture = json.load(file_handler)
+        except FileNotFoundError:
+            raise exceptions.APIRequestError("No recorded response for %s with %s in %s" % (path, params, self.directory))
+        return fixture['status'], fixture['body']
+
+#endregion record and replay
+
+#region stub server
+
+def synthetic_observation(name: str, timestamp: int, city_id: Optional[int]=None) -> dict:
+    """
+    Return a deterministic current weather response for `name` in OpenWeather's format.
+    """
+    seed = zlib.crc32(name.lower().encode('utf-8'))
+    temperature = 263.15 + seed % 35 + (timestamp // 3600 % 24) / 4
+    return {
+        'coord': {'lon': seed % 360 - 180, 'lat': seed % 170 - 85},
+        'weather': [{'id': 800, 'main': 'Clear', 'description': 'clear sky', 'icon': '01d'}],
+        'main': {'temp': temperature, 'feels_like': temperature, 'temp_min': temperature - 2, 'temp_max': temperature + 2, 'pressure': 1013, 'humidity': seed % 100},
+        'wind': {'speed': seed % 150 / 10, 'deg': seed % 360},
+        'clouds': {'all': seed % 101},
+        'dt': timestamp,
+        'sys': {'country': 'XX', 'sunrise': timestamp - 21600, 'sunset': timestamp + 21600},
+        'timezone': 0,
+        'id': city_id or seed % 10_000_000,
+        'name': name,
+        'cod': 200
+    }
+
+def synthetic_forecast(name: str, timestamp: int, count: int=40) -> dict:
+    """
+    Return a deterministic 5 day / 3 hour forecast response for `name` in OpenWeather's format.
+    """
+    start = timestamp - timestamp % 10800 + 10800
+    slots = [synthetic_observation(name, start + index * 10800) for index in range(count)]
+    return {
+        'cod': '200',
+        'cnt': count,
+        'list': [{key: slot[key] for key in ('dt', 'main', 'weather', 'clouds', 'wind')} for slot in slots],
+        'city': {'id': slots[0]['id'], 'name': name, 'coord': slots[0]['coord'], 'country': 'XX'}
+    }
+
+class StubServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the OpenWeather 2.5 API that answers from recorded
+    fixtures or synthetic data, with configurable latency and error rate.
+    Failures are drawn from a seeded random generator, so runs are repeatable.
+    """
+    daemon_threads = True
+
+    def __init__(self, host: str='127.0.0.1', port: int=0, latency: float=0, error_rate: float=0, fixtures: Optional[Union[str, Path]]=None, seed: int=0) -> StubServer:
+        super().__init__((host, port), StubRequestHandler)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.fixtures = Path(fixtures) if fixtures else None
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.names: Dict[int, str] = dict()
+
+    @property
+    def base_url(self) -> str:
+        return "http://%s:%d/data/2.5" % self.server_address[:2]
+
+    def respond(self, path: str, params: dict) -> Tuple[int, str]:
+        with self.lock:
+            self.requests += 1
+            failed = self.random.random() < self.error_rate
+
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            return 503, json.dumps({'cod': 503, 'message': 'Service unavailable'})
+
+        if self.fixtures is not None and (fixture := self.fixtures.joinpath(fixture_name(path, params))).is_file():
+            with open(fixture, mode='r', encoding='utf-8') as file_handler:
+                recorded = json.load(file_handler)
+            return recorded['status'], recorded['body']
+
+        now = int(time.time())
+        if 'q' in params:
+            name = params['q'].split(',')[0]
+            # remember the ID that a name resolved to, so that queries by ID return the same data
+            self.names[synthetic_observation(name, now)['id']] = name
+        else:
+            name = self.names.get(int(params['id']), f"City{params['id']}") if params.get('id', '').isdigit() else None
+        if path == 'weather' and name:
+            return 200, json.dumps(synthetic_observation(name, now))
+        if path == 'forecast' and name:
+            return 200, json.dumps(synthetic_forecast(name, now, int(params.get('cnt', 40))))
+        if path == 'group' and 'id' in params:
+            observations = [synthetic_observation(f"City{city_id}", now, int(city_id)) for city_id in params['id'].split(',')]
+            return 200, json.dumps({'cnt': len(observations), 'list': observations})
+        if path in ('box/city', 'find'):
+            observations = [synthetic_observation(f"City{index}", now, index) for index in range(int(params.get('cnt', 10)))]
+            return 200, json.dumps({'cod': '200', 'cnt': len(observations), 'list': observations})
+
+        return 404, json.dumps({'cod': '404', 'message': 'city not found'})
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately, which Nagle's algorithm would
+    # delay by up to 40ms on a kept-alive connection
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        path = url.path.split('/data/2.5/', 1)[-1]
+        status_code, body = self.server.respond(path, dict(parse_qsl(url.query)))
+        payload = body.encode('utf-8')
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog='python -m weather.replay', description="run a local stand-in for the OpenWeather API")
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on (defaults to 127.0.0.1)")
+    parser.add_argument('--port', default=8000, type=int, help="port to listen on (defaults to 8000)")
+    parser.add_argument('--latency', default=0, type=float, metavar='SECONDS', help="delay every response")
+    parser.add_argument('--error-rate', default=0, type=float, metavar='RATE', help="fraction of requests that fail with 503")
+    parser.add_argument('--fixtures', type=str, metavar='DIR', help="answer from responses recorded with 'weather --record DIR'")
+    parser.add_argument('--seed', default=0, type=int, help="seed for simulated failures")
+    args = parser.parse_args()
+
+    server = StubServer(args.host, args.port, args.latency, args.error_rate, args.fixtures, args.seed)
+    utils.print_on_success("Serving a stand-in OpenWeather API on %s (use 'weather --base-url %s')" % (server.base_url, server.base_url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+#endregion stub server
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+from datetime import datetime as dt
+from datetime import timezone
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from . import units
+
+#region aggregation
+
+RESAMPLE_INTERVALS = {'none': None, 'hour': 3600, 'day': 86400}
+
+def load_columns(rows: Iterable[Dict[str, str]]) -> Dict[str, np.ndarray]:
+    """
+    Collect saved report rows into one array per column in a single pass.
+    """
+    columns = {key: [] for key in ('Date', 'Location', 'UnitSystem', 'TemperatureMin', 'TemperatureNow', 'TemperatureMax', 'WindSpeed', 'Humidity')}
+    for row in rows:
+        for key, values in columns.items():
+            values.append(row[key])
+
+    return {
+        key: np.array(values, dtype=str if key in ('Location', 'UnitSystem') else float)
+        for key, values in columns.items()
+    }
+
+def normalize_units(columns: Dict[str, np.ndarray], unit_system: str) -> Dict[str, np.ndarray]:
+    """
+    Convert all temperature and wind speed columns to `unit_system` in place.
+    """
+    for source in np.unique(columns['UnitSystem']):
+        if source == unit_system.upper():
+            continue
+        mask = columns['UnitSystem'] == source
+        for key in units.TEMPERATURE_FIELDS:
+            columns[key][mask] = units.convert_temperature(columns[key][mask], source, unit_system)
+        for key in units.SPEED_FIELDS:
+            columns[key][mask] = units.convert_speed(columns[key][mask], source, unit_system)
+
+    return columns
+
+def aggregate(columns: Dict[str, np.ndarray], resample: str='day', window: Optional[int]=None) -> Dict[str, np.ndarray]:
+    """
+    Compute per-location statistics for every `resample` period (see
+    `RESAMPLE_INTERVALS`) and, if `window` is set, the rolling mean
+    temperature over the last `window` periods of each location.
+    """
+    if not columns['Date'].size:
+        return {}
+
+    interval = RESAMPLE_INTERVALS[resample]
+    locations, codes = np.unique(columns['Location'], return_inverse=True)
+    buckets = (columns['Date'] // interval).astype(np.int64) if interval else np.zeros(columns['Date'].size, dtype=np.int64)
+
+    order = np.lexsort((buckets, codes))
+    codes, buckets = codes[order], buckets[order]
+    starts = np.flatnonzero(np.r_[True, (np.diff(codes) != 0) | (np.diff(buckets) != 0)])
+    count = np.diff(np.r_[starts, codes.size])
+
+    mean = lambda key: np.add.reduceat(columns[key][order], starts) / count
+    result = {
+        'Location': locations[codes[starts]],
+        'Period': buckets[starts] * (interval or 0),
+        'TemperatureMin': np.minimum.reduceat(columns['TemperatureMin'][order], starts),
+        'TemperatureMean': mean('TemperatureNow'),
+        'TemperatureMax': np.maximum.reduceat(columns['TemperatureMax'][order], starts),
+        'WindSpeedMean': mean('WindSpeed'),
+        'WindSpeedMax': np.maximum.reduceat(columns['WindSpeed'][order], starts),
+        'HumidityMean': mean('Humidity'),
+        'Count': count
+    }
+
+    if window:
+        index = np.arange(starts.size)
+        group_codes = codes[starts]
+        first = np.flatnonzero(np.r_[True, np.diff(group_codes) != 0])
+        lower = np.maximum(index - window + 1, first[np.searchsorted(first, index, side='right') - 1])
+        cumsum = np.r_[0, np.cumsum(result['TemperatureMean'])]
+        result['TemperatureRolling'] = (cumsum[index + 1] - cumsum[lower]) / (index + 1 - lower)
+
+    return result
+
+def format_period(timestamp: int, resample: str) -> str:
+    """
+    Return a human-readable label for the period starting at `timestamp` (UTC).
+    """
+    if RESAMPLE_INTERVALS[resample] is None:
+        return 'all'
+    return dt.fromtimestamp(timestamp, tz=timezone.utc).strftime('%Y-%m-%d' if resample == 'day' else '%Y-%m-%d %H:00')
+
+#endregion aggregation
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+import csv
+import sqlite3
+from abc import ABC, abstractmethod
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+from . import utils
+from .config import REPORTDB, REPORTFILE
+
+#region report storage
+
+FIELDNAMES = ['Date', 'Location', 'UnitSystem', 'TemperatureMin', 'TemperatureNow', 'TemperatureMax', 'WindSpeed', 'Humidity', 'CloudCoverage']
+
+class ReportStore(ABC):
+    """
+    Defines the interface for saving and reading exported weather reports.
+    """
+    def __init__(self, path: Union[str, Path]) -> ReportStore:
+        self.path = Path(path)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(PATH={self.path})"
+
+    @abstractmethod
+    def append(self, rows: Iterable[Sequence]) -> None:
+        """
+        Append report records or exported rows (see `WeatherReport.record`
+        and `WeatherReport.export`) to the store.
+        """
+        pass
+
+    @abstractmethod
+    def read(self, locations: Optional[Sequence[str]]=None, since: Optional[float]=None, until: Optional[float]=None, unit_system: Optional[str]=None) -> Iterator[Dict[str, str]]:
+        """
+        Lazily yield all rows that match the passed filters in the order they
+        were saved (see `tail`). Locations are compared case-insensitively.
+        """
+        pass
+
+    @abstractmethod
+    def tail(self, count: int, locations: Optional[Sequence[str]]=None, since: Optional[float]=None, until: Optional[float]=None, unit_system: Optional[str]=None) -> List[Dict[str, str]]:
+        """
+        Return the `count` most recently saved rows that match the passed
+        filters in the order they were saved, without reading the store from
+        the start. Forecasts are saved with future dates, so this is not
+        necessarily chronological.
+        """
+        pass
+
+    @staticmethod
+    def matches(row: Dict[str, str], locations: Optional[Sequence[str]]=None, since: Optional[float]=None, until: Optional[float]=None, unit_system: Optional[str]=None) -> bool:
+        """
+        Test whether `row` passes all filters.
+        """
+        if locations and row['Location'].casefold() not in (location.casefold() for location in locations):
+            return False
+        if unit_system is not None and row['UnitSystem'] != unit_system:
+            return False
+        if since is not None and float(row['Date']) < since:
+            return False
+        if until is not None and float(row['Date']) > until:
+            return False
+        return True
+
+    @abstractmethod
+    def reset(self) -> None:
+        """
+        Discard all rows.
+        """
+        pass
+
+    def empty(self) -> bool:
+        """
+        Test whether the store contains no rows.
+        """
+        return not self.tail(1)
+
+class CsvReportStore(ReportStore):
+    """
+    Stores reports in a plain CSV file (default).
+    """
+    def __init__(self, path: Optional[Union[str, Path]]=None) -> CsvReportStore:
+        super().__init__(path or utils.get_resource_path(REPORTFILE))
+
+    def append(self, rows: Iterable[Sequence]) -> None:
+        utils.write_csv_rows(self.path, FIELDNAMES, rows)
+
+    def read(self, locations: Optional[Sequence[str]]=None, since: Optional[float]=None, until: Optional[float]=None, unit_system: Optional[str]=None) -> Iterator[Dict[str, str]]:
+        with open(self.path, mode='r', encoding='utf-8') as file_handler:
+            for row in csv.DictReader(file_handler):
+                if self.matches(row, locations, since, until, unit_system):
+                    yield row
+
+    def tail(self, count: int, locations: Optional[Sequence[str]]=None, since: Optional[float]=None, until: Optional[float]=None, unit_system: Optional[str]=None) -> List[Dict[str, str]]:
+        rows = []
+        for line in utils.read_lines_reversed(self.path):
+            if len(rows) >= count:
+                break
+            values = next(csv.reader([line]), None)
+            if not values or values == FIELDNAMES:
+                continue
+            row = dict(zip(FIELDNAMES, values))
+            if self.matches(row, locations, since, until, unit_system):
+                rows.append(row)
+        return rows[::-1]
+
+    def reset(self) -> None:
+        utils.reset_file(self.path)
+
+class SqliteReportStore(ReportStore):
+    """
+    Stores reports in an indexed SQLite database, so that appends stay cheap
+    and range queries by location or date don't scan the whole history.
+    """
+    def __init__(self, path: Optional[Union[str, Path]]=None) -> SqliteReportStore:
+        super().__init__(path or utils.get_resource_path(REPORTDB))
+        self.connection = sqlite3.connect(self.path, timeout=10)
+        with self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS reports (
+                    date REAL NOT NULL,
+                    location TEXT NOT NULL,
+                    unit_system TEXT NOT NULL,
+                    temperature_min REAL,
+                    temperature_now REAL,
+                    temperature_max REAL,
+                    wind_speed REAL,
+                    humidity INTEGER,
+                    cloud_coverage INTEGER
+                )
+            """)
+            # locations are filtered case-insensitively (see ReportStore.read)
+            self.connection.execute("CREATE INDEX IF NOT EXISTS reports_location_nocase_date ON reports (location COLLATE NOCASE, date)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS reports_date ON reports (date)")
+
+    def append(self, rows: Iterable[Sequence]) -> None:
+        with self.connection:
+            self.connection.executemany("INSERT INTO reports VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def _select(self, order: str, limit: int, locations: Optional[Sequence[str]], since: Optional[float], until: Optional[float], unit_system: Optional[str]) -> sqlite3.Cursor:
+        clauses, params = [], []
+        for clause, param in (("date >= ?", since), ("date <= ?", until), ("unit_system = ?", unit_system)):
+            if param is not None:
+                clauses.append(clause)
+                params.append(param)
+        if locations:
+            clauses.append(f"location COLLATE NOCASE IN ({', '.join('?' * len(locations))})")
+            params.extend(locations)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        return self.connection.execute(f"SELECT * FROM reports {where} ORDER BY {order} LIMIT ?", (*params, limit))
+
+    def read(self, locations: Optional[Sequence[str]]=None, since: Optional[float]=None, until: Optional[float]=None, unit_system: Optional[str]=None) -> Iterator[Dict[str, str]]:
+        for row in self._select('rowid ASC', -1, locations, since, until, unit_system):
+            yield dict(zip(FIELDNAMES, map(str, row)))
+
+    def tail(self, count: int, locations: Optional[Sequence[str]]=None, since: Optional[float]=None, until: Optional[float]=None, unit_system: Optional[str]=None) -> List[Dict[str, str]]:
+        rows = self._select('rowid DESC', count, locations, since, until, unit_system).fetchall()
+        return [dict(zip(FIELDNAMES, map(str, row))) for row in reversed(rows)]
+
+    def reset(self) -> None:
+        with self.connection:
+            self.connection.execute("DELETE FROM reports")
+        self.connection.execute("VACUUM")
+
+STORAGE_BACKENDS = {'csv': CsvReportStore, 'sqlite': SqliteReportStore}
+
+def get_report_store(backend: str='csv') -> ReportStore:
+    """
+    Return the report store for `backend` (see `STORAGE_BACKENDS`).
+    """
+    return STORAGE_BACKENDS[backend.lower()]()
+
+def migrate(source: ReportStore, target: ReportStore, batch_size: int=10_000, force: bool=False) -> int:
+    """
+    Copy all rows from `source` to `target` in batches and return the number
+    of rows copied. Unless `force` is set, a `target` that already contains
+    rows is refused, so that migrating twice doesn't duplicate the history.
+    """
+    if not force and not target.empty():
+        raise ValueError("%s already contains reports." % target)
+
+    count = 0
+    rows = (list(row.values()) for row in source.read())
+    while batch := list(islice(rows, batch_size)):
+        target.append(batch)
+        count += len(batch)
+    return count
+
+#endregion report storage
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+from __future__ import annotations
+
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Sequence, TypeVar
+
+#region unit conversion
+
+# Kelvin and meters per second are the canonical units: OpenWeather reports
+# them by default, and all other units are derived from them. Every function
+# works on plain numbers as well as element-wise on NumPy arrays.
+
+KELVIN_OFFSET = 273.15
+FAHRENHEIT_OFFSET = 32.0
+FAHRENHEIT_DEGREE_SCALE = 1.8
+MILES_PER_HOUR_FOR_ONE_METER_PER_SEC = 2.23694
+
+TEMPERATURE_SYMBOLS = {'SI': 'C', 'IMPERIAL': 'F'}
+SPEED_SYMBOLS = {'SI': 'm/s', 'IMPERIAL': 'mph'}
+
+Number = TypeVar('Number')
+
+def kelvin_to(values: Number, unit_system: str) -> Number:
+    """
+    Convert temperatures from Kelvin to Celsius (SI) or Fahrenheit (IMPERIAL).
+    """
+    celsius = values - KELVIN_OFFSET
+    return celsius if unit_system.upper() == 'SI' else celsius * FAHRENHEIT_DEGREE_SCALE + FAHRENHEIT_OFFSET
+
+def to_kelvin(values: Number, unit_system: str) -> Number:
+    """
+    Convert temperatures from Celsius (SI) or Fahrenheit (IMPERIAL) to Kelvin.
+    """
+    celsius = values if unit_system.upper() == 'SI' else (values - FAHRENHEIT_OFFSET) / FAHRENHEIT_DEGREE_SCALE
+    return celsius + KELVIN_OFFSET
+
+def speed_from_si(values: Number, unit_system: str) -> Number:
+    """
+    Convert wind speeds from meters per second to the speed unit of `unit_system`.
+    """
+    return values if unit_system.upper() == 'SI' else values * MILES_PER_HOUR_FOR_ONE_METER_PER_SEC
+
+def speed_to_si(values: Number, unit_system: str) -> Number:
+    """
+    Convert wind speeds from the speed unit of `unit_system` to meters per second.
+    """
+    return values if unit_system.upper() == 'SI' else values / MILES_PER_HOUR_FOR_ONE_METER_PER_SEC
+
+def convert_temperature(values: Number, source: str, target: str) -> Number:
+    """
+    Convert temperatures between the units of two unit systems.
+    """
+    return values if source.upper() == target.upper() else kelvin_to(to_kelvin(values, source), target)
+
+def convert_speed(values: Number, source: str, target: str) -> Number:
+    """
+    Convert wind speeds between the units of two unit systems.
+    """
+    return values if source.upper() == target.upper() else speed_from_si(speed_to_si(values, source), target)
+
+TEMPERATURE_FIELDS = ('TemperatureMin', 'TemperatureNow', 'TemperatureMax')
+SPEED_FIELDS = ('WindSpeed',)
+
+def convert_rows(rows: Sequence[Dict[str, str]], unit_system: str) -> List[Dict[str, str]]:
+    """
+    Convert a batch of saved report rows to `unit_system`. Rows are grouped by
+    their source unit system, and each column of a group is converted in one
+    array operation if NumPy is available.
+    """
+    try:
+        import numpy as np
+        as_array = lambda values: np.asarray(values, dtype=float)
+    except ImportError:
+        as_array = None
+
+    target = unit_system.upper()
+    rows = [dict(row) for row in rows]
+    groups: Dict[str, List[Dict[str, str]]] = dict()
+    for row in rows:
+        if row['UnitSystem'] != target:
+            groups.setdefault(row['UnitSystem'], []).append(row)
+
+    for source, group in groups.items():
+        for fields, convert in ((TEMPERATURE_FIELDS, convert_temperature), (SPEED_FIELDS, convert_speed)):
+            for field in fields:
+                values = [float(row[field]) for row in group]
+                converted = convert(as_array(values), source, target).round(2).tolist() if as_array else [round(convert(value, source, target), 2) for value in values]
+                for row, value in zip(group, converted):
+                    row[field] = str(value)
+        for row in group:
+            row['UnitSystem'] = target
+
+    return rows
+
+def convert_stream(rows: Iterable[Dict[str, str]], unit_system: str, batch_size: int=1024) -> Iterator[Dict[str, str]]:
+    """
+    Lazily convert a stream of saved report rows to `unit_system` in batches of `batch_size`.
+    """
+    rows = iter(rows)
+    for batch in iter(lambda: list(islice(rows, batch_size)), []):
+        yield from convert_rows(batch, unit_system)
+
+#endregion unit conversion
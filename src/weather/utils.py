@@ -1,18 +1,29 @@
 #!/usr/bin/env python3
 
+from __future__ import annotations
+
 import csv
+import gzip
+import hashlib
+import io
 import json
 import logging
+import logging.handlers
 import os
 import platform
+import re
+import shutil
 import sys
-from collections import namedtuple
-from itertools import chain
+import tempfile
+import threading
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from itertools import chain, islice
 from json.decoder import JSONDecodeError
 from pathlib import Path
-from typing import Dict, List, Union
+from typing import Dict, Iterable, Iterator, List, Optional, TextIO, Union
 
-from . import config
+from . import config, profiling
 from .__init__ import package_name
 from .config import BRIGHT, CYAN, DIM, GREEN, NORMAL, RED, RESET_ALL, YELLOW
 
@@ -32,57 +43,346 @@ def get_resource_path(filename: Union[str, Path]) -> Path:
     """
     Return a platform-specific log file path.
     """
-    config_dir = get_config_dir()
-    config_dir.mkdir(parents=True, exist_ok=True)
-    resource = config_dir.joinpath(filename)
-    resource.touch(exist_ok=True)
-    return resource
+    with profiling.span('resource', path=filename):
+        config_dir = get_config_dir()
+        config_dir.mkdir(parents=True, exist_ok=True)
+        resource = config_dir.joinpath(filename)
+        resource.touch(exist_ok=True)
+        return resource
+
+class LazyFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    File handler that creates its log file (and parent directories) on the
+    first emitted record rather than at import time, and rotates it into
+    gzip-compressed backups (`error.log.1.gz`, ...) once it exceeds `max_bytes`.
+
+    Several processes may share the log file (e.g. `weather serve` and CLI
+    runs): rollovers hold a file lock, and every handler reopens the log once
+    another process rotated it away (like `logging.handlers.WatchedFileHandler`).
+    """
+    def __init__(self, filename: Union[str, Path], max_bytes: int=config.LOG_MAX_BYTES, backup_count: int=config.LOG_BACKUP_COUNT) -> LazyFileHandler:
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        self.namer = lambda name: f"{name}.gz"
+        self.rotator = compress_file
+        self.identity = None
+
+    def _open(self):
+        Path(self.baseFilename).parent.mkdir(parents=True, exist_ok=True)
+        stream = super()._open()
+        stat = os.fstat(stream.fileno())
+        self.identity = (stat.st_dev, stat.st_ino)
+        return stream
+
+    def reopen_if_rotated(self) -> None:
+        """
+        Close the stream if the log file was rotated by another process since
+        it was opened, so that the next record goes to the new log file.
+        """
+        if self.stream is None:
+            return
+        try:
+            stat = os.stat(self.baseFilename)
+            identity = (stat.st_dev, stat.st_ino)
+        except FileNotFoundError:
+            identity = None
+        if identity != self.identity:
+            self.stream.close()
+            self.stream = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            self.reopen_if_rotated()
+        except OSError:
+            self.handleError(record)
+            return
+        super().emit(record)
+
+    def doRollover(self) -> None:
+        with file_lock(self.baseFilename):
+            # another process may have rotated the log while this one waited
+            self.reopen_if_rotated()
+            if self.stream is not None or (os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) >= self.maxBytes):
+                super().doRollover()
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats every record as one JSON object per line.
+    """
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'timestamp': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'lineno': record.lineno,
+            'name': record.name,
+            'message': record.getMessage()
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+def compress_file(source: str, target: str) -> None:
+    with open(source, mode='rb') as source_handler, gzip.open(target, mode='wb') as target_handler:
+        shutil.copyfileobj(source_handler, target_handler)
+    os.remove(source)
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
-formatter = logging.Formatter('%(asctime)s::%(levelname)s::%(lineno)d::%(name)s::%(message)s', datefmt='%Y-%m-%d %H:%M:%S')
-file_handler = logging.FileHandler(get_resource_path(config.LOGFILE))
+formatter = JsonFormatter(datefmt='%Y-%m-%d %H:%M:%S')
+file_handler = LazyFileHandler(get_config_dir().joinpath(config.LOGFILE))
 file_handler.setFormatter(formatter)
 logger.addHandler(file_handler)
 
+LOG_FIELDS = ('timestamp', 'level', 'lineno', 'name', 'message')
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+def parse_log_line(line: str) -> Optional[dict]:
+    """
+    Parse one line of the log file, or return `None` if it isn't a log entry.
+    """
+    line = line.strip()
+    if line.startswith('{'):
+        try:
+            return json.loads(line)
+        except ValueError:
+            return None
+
+    # entries written before the log was structured
+    fields = line.split('::', len(LOG_FIELDS) - 1)
+    return dict(zip(LOG_FIELDS, fields)) if len(fields) == len(LOG_FIELDS) else None
+
+def get_log_backups(filename: Union[str, Path]) -> List[Path]:
+    """
+    Return the rotated backups of `filename` from oldest to newest.
+    """
+    path = Path(filename)
+    backups = [backup for backup in path.parent.glob(f"{path.name}.*.gz") if backup.name.split('.')[-2].isdigit()]
+    return sorted(backups, key=lambda backup: int(backup.name.split('.')[-2]), reverse=True)
+
+def matches_log_entry(entry: dict, level: Optional[str]=None, since: Optional[str]=None, pattern: Optional[re.Pattern]=None) -> bool:
+    """
+    Test whether `entry` is at least as severe as `level`, was logged at or
+    after `since` (formatted like its timestamp) and its message matches `pattern`.
+    """
+    if level is not None and (entry['level'] not in LOG_LEVELS or LOG_LEVELS.index(entry['level']) < LOG_LEVELS.index(level)):
+        return False
+    if since is not None and entry['timestamp'] < since:
+        return False
+    if pattern is not None and not pattern.search(entry['message']):
+        return False
+    return True
+
+def read_log(filename: Union[str, Path], level: Optional[str]=None, since: Optional[str]=None, pattern: Optional[re.Pattern]=None) -> Iterator[dict]:
+    """
+    Lazily yield all matching entries of the log file and its rotated backups
+    in chronological order, parsing each line once.
+    """
+    for path in [*get_log_backups(filename), Path(filename)]:
+        if not path.is_file():
+            continue
+        with (gzip.open(path, mode='rt', encoding='utf-8') if path.suffix == '.gz' else open(path, mode='r', encoding='utf-8')) as file_handler:
+            for line in file_handler:
+                if (entry := parse_log_line(line)) is not None and matches_log_entry(entry, level, since, pattern):
+                    yield entry
+
+def tail_log(filename: Union[str, Path], count: int, level: Optional[str]=None, since: Optional[str]=None, pattern: Optional[re.Pattern]=None) -> List[dict]:
+    """
+    Return the last `count` matching entries in chronological order. The log
+    file is read backwards from its end, and rotated backups are only
+    decompressed if it doesn't hold enough matching entries.
+    """
+    entries, done = [], count <= 0
+    if not done and Path(filename).is_file():
+        for line in read_lines_reversed(filename):
+            if (entry := parse_log_line(line)) is None:
+                continue
+            # everything before this entry is older than `since`
+            if done := since is not None and entry['timestamp'] < since:
+                break
+            if matches_log_entry(entry, level, since, pattern):
+                entries.append(entry)
+                if done := len(entries) >= count:
+                    break
+    entries.reverse()
+
+    for backup in reversed(get_log_backups(filename)):
+        if done or len(entries) >= count:
+            break
+        with gzip.open(backup, mode='rt', encoding='utf-8') as file_handler:
+            older = deque((entry for line in file_handler if (entry := parse_log_line(line)) is not None and matches_log_entry(entry, level, since, pattern)), maxlen=count - len(entries))
+        entries = [*older, *entries]
+
+    return entries
+
 #endregion logging
 
 #region misc
 
-def read_json_file(filename: Union[str, Path]) -> dict:
+class JsonFile(object):
     """
-    Read `filename` and, if this file is empty, return an empty dictionary in its place.
+    Cached view of a JSON file in the config directory. The file is only read
+    again once its modification time or size changed, and updates are written
+    atomically (temporary file plus rename) while holding its lock file.
     """
-    with open(get_resource_path(filename), mode='r', encoding='utf-8') as file_handler:
+    def __init__(self, filename: Union[str, Path]) -> JsonFile:
+        self.path = get_config_dir().joinpath(filename)
+        self.lock = threading.Lock()
+        self._data: dict = dict()
+        self._version: Optional[tuple] = None
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(PATH={self.path})"
+
+    def _stat(self) -> Optional[tuple]:
         try:
-            return json.load(file_handler)
-        except JSONDecodeError:
-            return dict()
+            stat = self.path.stat()
+            return stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+    def _read(self) -> dict:
+        """
+        Return the cached contents, reading the file again if it changed on disk.
+        """
+        if (version := self._stat()) != self._version:
+            try:
+                with open(self.path, mode='r', encoding='utf-8') as file_handler:
+                    data = json.load(file_handler)
+            except (FileNotFoundError, JSONDecodeError):
+                data = dict()
+            self._data, self._version = data if isinstance(data, dict) else dict(), version
+        return self._data
+
+    def load(self) -> dict:
+        """
+        Return a copy of the file's contents, or an empty dictionary if it is empty or doesn't exist yet.
+        """
+        with self.lock:
+            return dict(self._read())
+
+    def update(self, params: dict) -> dict:
+        """
+        Merge `params` into the file in a single atomic write and return the new contents.
+        """
+        with self.lock, file_lock(str(self.path)):
+            data = {**self._read(), **params}
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(mode='w', encoding='utf-8', dir=self.path.parent, prefix=f".{self.path.name}.", suffix='.tmp', delete=False) as file_handler:
+                json.dump(data, file_handler)
+                file_handler.write('\n')
+                file_handler.flush()
+                os.fsync(file_handler.fileno())
+            os.replace(file_handler.name, self.path)
+            self._data, self._version = data, self._stat()
+            return dict(data)
 
-def write_json_file(filename: Union[str, Path], params: dict) -> None:
+_json_files: Dict[str, JsonFile] = dict()
+
+def get_json_file(filename: Union[str, Path]) -> JsonFile:
+    """
+    Return the cached view of `filename` that is shared by this process.
+    """
+    if (key := str(filename)) not in _json_files:
+        _json_files[key] = JsonFile(filename)
+    return _json_files[key]
+
+def read_json_file(filename: Union[str, Path]) -> dict:
+    """
+    Read `filename` and, if this file is empty or doesn't exist yet, return an empty dictionary in its place.
+    """
+    return get_json_file(filename).load()
+
+def write_json_file(filename: Union[str, Path], params: dict) -> dict:
     """
     Save the data in `params` as a JSON file by creating an union of pre-existing data (if any).
     """
-    config = read_json_file(filename)
-    with open(get_resource_path(filename), mode='w', encoding='utf-8') as file_handler:
-        json.dump({**config, **params}, file_handler)
-        file_handler.write('\n')
+    return get_json_file(filename).update(params)
+
+def read_lines(filename: Union[str, Path]) -> List[str]:
+    """
+    Return all non-empty lines in `filename` that are not commented out with `#`.
+    """
+    with open(filename, mode='r', encoding='utf-8') as file_handler:
+        return [line.strip() for line in file_handler if line.strip() and not line.lstrip().startswith('#')]
+
+def read_lines_reversed(filename: Union[str, Path], chunk_size: int=1 << 16) -> Iterator[str]:
+    """
+    Lazily yield the lines of `filename` from last to first by seeking
+    backwards in chunks of `chunk_size` bytes.
+    """
+    with open(filename, mode='rb') as file_handler:
+        position = file_handler.seek(0, os.SEEK_END)
+        remainder = b''
+        while position > 0:
+            offset = max(0, position - chunk_size)
+            file_handler.seek(offset)
+            lines = (file_handler.read(position - offset) + remainder).split(b'\n')
+            position = offset
+            remainder = lines.pop(0)
+            for line in reversed(lines):
+                if line:
+                    yield line.decode('utf-8')
+        if remainder:
+            yield remainder.decode('utf-8')
+
+@contextmanager
+def file_lock(name: str) -> Iterator[Path]:
+    """
+    Hold an exclusive lock on the lock file for `name` in the config directory
+    while the enclosed block runs, so that only one process at a time enters it.
+    """
+    lock_dir = get_config_dir().joinpath(config.LOCKDIR)
+    lock_dir.mkdir(parents=True, exist_ok=True)
+    path = lock_dir.joinpath("%s.lock" % hashlib.sha1(name.encode('utf-8')).hexdigest()[:16])
+
+    with open(path, mode='a+b') as file_handler:
+        if platform.system() == 'Windows':
+            import msvcrt
+            file_handler.seek(0)
+            while True:
+                try:
+                    # gives up after 10 attempts, so keep trying until the lock is released
+                    msvcrt.locking(file_handler.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        else:
+            import fcntl
+            fcntl.flock(file_handler, fcntl.LOCK_EX)
+
+        try:
+            yield path
+        finally:
+            if platform.system() == 'Windows':
+                file_handler.seek(0)
+                msvcrt.locking(file_handler.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(file_handler, fcntl.LOCK_UN)
 
 def reset_file(filename: Union[str, Path]) -> None:
     open(get_resource_path(filename), mode='w', encoding='utf-8').close()
 
 
 def write_csv(filename: Union[str, Path], data: Dict[str, str]) -> None:
+    write_csv_rows(filename, data.keys(), [data.values()])
+
+def write_csv_rows(filename: Union[str, Path], fieldnames: Iterable[str], rows: Iterable[Iterable[str]]) -> None:
+    """
+    Append `rows` to `filename` in a single buffered write, adding a header if the file is empty.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=',', lineterminator='\n')
     with open(filename, mode='a', encoding='utf-8') as file_handler:
-        writer = csv.DictWriter(file_handler, delimiter=',', lineterminator='\n', fieldnames=data.keys())
-        if os.stat(filename).st_size == 0:
-            writer.writeheader()
-        writer.writerow(data)
+        if file_handler.tell() == 0:
+            writer.writerow(fieldnames)
+        writer.writerows(rows)
+        file_handler.write(buffer.getvalue())
 
 #endregion misc
 
 #region terminal formatting
 
+ANSI_ESCAPE = re.compile(r'\033\[[0-9;]*m')
+
 def print_dict(title_left: str, title_right: str, table: dict) -> None:
     """
     Print a flat dictionary as table with two column titles.
@@ -97,6 +397,79 @@ def print_dict(title_left: str, title_right: str, table: dict) -> None:
         print(key + tabs(key) + value)
     print()
 
+def print_table(header: List[str], rows: Iterable[Iterable[str]], file: Optional[TextIO]=None) -> None:
+    """
+    Print `rows` as one table whose column widths fit the widest visible cell.
+    """
+    rows = [list(map(str, row)) for row in rows]
+    visible = lambda cell: len(ANSI_ESCAPE.sub('', cell))
+    widths = [max(map(visible, column)) + 2 for column in zip(header, *rows)]
+    pad = lambda cells: ''.join(cell + ' ' * (width - visible(cell)) for cell, width in zip(cells, widths)).rstrip() + '\n'
+    write_lines(chain(['\n', BRIGHT + GREEN + pad(header).rstrip('\n') + RESET_ALL + '\n'], map(pad, rows), ['\n']), file=file)
+
+class LiveTable(object):
+    """
+    Table that stays on screen and, on every `render`, repaints only the cells
+    whose value changed by moving the cursor with ANSI escape sequences. The
+    cursor rests on a status line below the table.
+    """
+    def __init__(self, header: List[str], file: Optional[TextIO]=None) -> LiveTable:
+        self.header = header
+        self.file = file or sys.stdout
+        self.rows: List[List[str]] = []
+        self.widths: List[int] = []
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(ROWS={len(self.rows)})"
+
+    @staticmethod
+    def visible(cell: str) -> int:
+        return len(ANSI_ESCAPE.sub('', cell))
+
+    def pad(self, cell: str, width: int) -> str:
+        return cell + ' ' * (width - self.visible(cell))
+
+    def render(self, rows: Iterable[Iterable[str]], status: str='') -> int:
+        """
+        Show `rows` and `status` and return the number of repainted cells.
+        """
+        rows = [list(map(str, row)) for row in rows]
+        fits = len(rows) == len(self.rows) and all(self.visible(cell) < width for row in rows for cell, width in zip(row, self.widths))
+
+        if not fits:
+            # (re)draw everything, e.g. on the first call or if a value outgrew its column
+            erase = f"\033[{len(self.rows) + 1}A\r\033[J" if self.rows else '\n'
+            self.widths = [max(map(self.visible, column)) + 2 for column in zip(self.header, *rows)]
+            lines = [BRIGHT + GREEN + ''.join(self.pad(cell, width) for cell, width in zip(self.header, self.widths)) + RESET_ALL]
+            lines += [''.join(self.pad(cell, width) for cell, width in zip(row, self.widths)) for row in rows]
+            self.file.write(erase + '\n'.join(lines) + '\n' + status + '\033[K')
+            self.file.flush()
+            self.rows = rows
+            return sum(map(len, rows))
+
+        changes = []
+        for index, (old, new) in enumerate(zip(self.rows, rows)):
+            up = len(rows) - index
+            for column, (before, after) in enumerate(zip(old, new)):
+                if before != after:
+                    offset = sum(self.widths[:column])
+                    move = f"\033[{offset}C" if offset else ''
+                    changes.append(f"\033[{up}A\r{move}{self.pad(after, self.widths[column])}\033[{up}B")
+
+        self.file.write(''.join(changes) + '\r' + status + '\033[K')
+        self.file.flush()
+        self.rows = rows
+        return len(changes)
+
+def write_lines(lines: Iterable[str], batch_size: int=1024, file: Optional[TextIO]=None) -> None:
+    """
+    Write `lines` to `file` (defaults to stdout) in batches of `batch_size` to reduce the number of write calls.
+    """
+    file, lines = file or sys.stdout, iter(lines)
+    for batch in iter(lambda: list(islice(lines, batch_size)), []):
+        file.write(''.join(batch))
+    file.flush()
+
 def print_on_success(message: str, verbose: bool=True) -> None:
     """
     Print a formatted success message if verbose is enabled.
@@ -109,7 +482,7 @@ def print_on_warning(message: str, verbose: bool=True) -> None:
     Print a formatted warning message if verbose is enabled.
     """
     if verbose:
-        print(f"{BRIGHT}{YELLOW}{'[ WARNING ]'.ljust(12, ' ')}{RESET_ALL}{message}")
+        print(f"{BRIGHT}{YELLOW}{'[ WARNING ]'.ljust(12, ' ')}{RESET_ALL}{message}", file=sys.stderr)
 
 def print_on_error(message: str, verbose: bool=True) -> None:
     """
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip('aiohttp')
+
+from weather.aio import AsyncWeatherReport, close_session, fetch_reports
+from weather.cache import ResponseCache
+from weather.core import WeatherReport
+from weather.locations import LocationIndex
+
+
+def run(coroutine):
+    async def main():
+        try:
+            return await coroutine
+        finally:
+            await close_session()
+    return asyncio.run(main())
+
+def test_results_match_weather_report(home, stub_server, transport, token):
+    transport(base_url=stub_server.base_url)
+    reports = [AsyncWeatherReport(token, location, 'SI') for location in ('rome', 'paris', 'rome')]
+    results = run(fetch_reports(reports))
+
+    assert all(error is None for _, error in results)
+    assert [report.export()[1:] for report in reports] == [WeatherReport(token, location, 'SI').export()[1:] for location in ('rome', 'paris', 'rome')]
+
+def test_unfetched_report_raises(token):
+    with pytest.raises(RuntimeError):
+        AsyncWeatherReport(token, 'rome', 'SI').build()
+
+def test_sqlite_runs_off_the_event_loop(home, stub_server, transport, token, monkeypatch):
+    transport(base_url=stub_server.base_url)
+    cache, locations = ResponseCache(), LocationIndex()
+    threads = []
+    for instance, name in ((cache, 'get'), (cache, 'set'), (locations, 'resolve'), (locations, 'learn')):
+        function = getattr(instance, name)
+        monkeypatch.setattr(instance, name, lambda *args, function=function, name=name, **kwargs: threads.append((name, threading.get_ident())) or function(*args, **kwargs))
+
+    async def fetch():
+        report = AsyncWeatherReport(token, 'rome', 'SI', cache=cache, locations=locations)
+        await report.fetch()
+        return threading.get_ident()
+
+    loop_thread = run(fetch())
+    assert {name for name, _ in threads} == {'get', 'set', 'resolve', 'learn'}
+    assert all(thread != loop_thread for _, thread in threads)
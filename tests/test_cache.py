@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+import time
+
+import pytest
+
+from weather.cache import ResponseCache
+from weather.core import WeatherReport
+
+KEY = ('Rome', 'today', 'SI')
+
+@pytest.fixture
+def cache(tmp_path):
+    with ResponseCache(tmp_path.joinpath('cache.db'), max_entries=2) as cache:
+        yield cache
+
+def test_get_respects_max_age(cache):
+    cache.set(KEY, {'temp': 1}, created=time.time() - 60)
+    assert cache.get(KEY, max_age=120)[1] == {'temp': 1}
+    assert cache.get(KEY, max_age=30) is None
+
+def test_least_recently_used_entries_are_evicted(cache):
+    for location in ('Rome', 'Paris', 'Berlin'):
+        cache.set((location, 'today', 'SI'), location)
+    assert cache.get(('Rome', 'today', 'SI'), max_age=60) is None
+    assert cache.get(('Berlin', 'today', 'SI'), max_age=60)[1] == 'Berlin'
+
+def test_unreadable_entry_is_a_miss(cache):
+    cache.set(KEY, 'value')
+    with cache.connection:
+        cache.connection.execute("UPDATE responses SET payload = ?", (b'not a pickle',))
+
+    assert cache.get(KEY, max_age=60) is None
+    assert cache.stats()['Entries'] == '0/2'
+
+def test_report_refetches_unreadable_entry(home, stub_server, transport, token, cache):
+    transport(base_url=stub_server.base_url)
+    cache.set(('Rome', 'today', 'SI'), 'stale')
+    with cache.connection:
+        cache.connection.execute("UPDATE responses SET payload = ?", (b'\x80\x05corrupt',))
+
+    assert WeatherReport(token, 'rome', 'SI', cache=cache).export()[1] == 'Rome'
+    assert stub_server.requests == 1
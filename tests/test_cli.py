@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+import json
+
+import pytest
+
+from weather import utils
+from weather.config import CONFIGFILE
+
+def read_config() -> dict:
+    return json.loads(utils.get_config_dir().joinpath(CONFIGFILE).read_text(encoding='utf-8'))
+
+def test_config_only_writes_passed_flags(weather):
+    assert weather('config', '--unit-system', 'imperial').returncode == 0
+    assert weather('config', '--location', 'rome').returncode == 0
+
+    config = read_config()
+    assert (config['Location'], config['UnitSystem']) == ('rome', 'IMPERIAL')
+
+@pytest.mark.parametrize('flag', ['--limit', '--offset', '--tail'])
+def test_list_rejects_negative_counts(weather, flag):
+    result = weather('report', '--list', flag, '-1')
+    assert result.returncode == 2
+    assert 'Traceback' not in result.stderr
+
+@pytest.mark.parametrize('storage', ['csv', 'sqlite'])
+def test_list_tail_zero_is_empty(weather, storage):
+    weather('config', '--storage', storage)
+    assert weather('report', '--location', 'rome', 'paris', '--save').returncode == 0
+
+    assert len(weather('report', '--list', '--tail', '1', '--format', 'ndjson').stdout.splitlines()) == 1
+    assert weather('report', '--list', '--tail', '0', '--format', 'ndjson').stdout == ''
+
+@pytest.mark.parametrize('value, enabled', [('1', True), ('true', True), ('0', False), ('false', False), ('', False)])
+def test_timings_environment_variable(weather, value, enabled):
+    result = weather('config', '--path', env={'WEATHER_TIMINGS': value})
+    assert result.returncode == 0
+    assert ('Phase' in result.stderr) == enabled
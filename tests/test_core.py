@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from pyowm.weatherapi25.forecast import Forecast
+from pyowm.weatherapi25.forecaster import Forecaster
+from pyowm.weatherapi25.observation import Observation
+
+from weather.core import Mode, WeatherReport, fetch_reports, project_reports
+from weather.replay import synthetic_forecast, synthetic_observation
+
+
+class CountingWeatherManager(object):
+    """
+    Stands in for PyOWM's weather manager and counts the requests it would send.
+    """
+    def __init__(self):
+        self.calls = {'weather_at_place': 0, 'forecast_at_place': 0}
+
+    def weather_at_place(self, name: str) -> Observation:
+        self.calls['weather_at_place'] += 1
+        return Observation.from_dict(synthetic_observation(name, int(time.time())))
+
+    def forecast_at_place(self, name: str, interval: str) -> Forecaster:
+        self.calls['forecast_at_place'] += 1
+        forecast = Forecast.from_dict(synthetic_forecast(name, int(time.time())))
+        forecast.interval = interval
+        return Forecaster(forecast)
+
+class SlowWeatherManager(CountingWeatherManager):
+    """
+    Takes `delay` seconds to answer for `slow`.
+    """
+    def __init__(self, slow: str, delay: float):
+        super().__init__()
+        self.slow, self.delay = slow, delay
+
+    def weather_at_place(self, name: str) -> Observation:
+        if name == self.slow:
+            time.sleep(self.delay)
+        return super().weather_at_place(name)
+
+@pytest.fixture
+def weather_manager():
+    return CountingWeatherManager()
+
+def test_build_and_export_share_one_request(token, weather_manager):
+    report = WeatherReport(token, 'rome', 'SI', weather_manager=weather_manager)
+    data, row = report.build(), report.export()
+
+    assert weather_manager.calls == {'weather_at_place': 1, 'forecast_at_place': 0}
+    assert data['Location'] == row[1] == 'Rome'
+
+def test_refresh_fetches_a_new_snapshot(token, weather_manager):
+    report = WeatherReport(token, 'rome', 'SI', weather_manager=weather_manager)
+    snapshot = report.snapshot
+    report.build()
+
+    assert report.refresh() is not snapshot
+    report.export()
+    assert weather_manager.calls['weather_at_place'] == 2
+
+def test_forecast_modes_share_one_request(token, weather_manager):
+    report = WeatherReport(token, 'rome', 'SI', Mode.TOMORROW, hour=15, weather_manager=weather_manager)
+    report.build()
+    report.export()
+    slots = report.slots()
+
+    assert len(slots) == 40
+    assert [slot.record() for slot in slots]
+    assert weather_manager.calls == {'weather_at_place': 0, 'forecast_at_place': 1}
+
+def test_snapshot_is_immutable(token, weather_manager):
+    report = WeatherReport(token, 'rome', 'SI', weather_manager=weather_manager)
+    with pytest.raises(AttributeError):
+        report.snapshot.timestamp = 0
+
+def test_projection_reports_the_slot_time(token, weather_manager):
+    report = WeatherReport(token, 'rome', 'SI', Mode.TOMORROW, weather_manager=weather_manager)
+    slot = report.snapshot.forecast.times[4]
+
+    assert report.project(slot + 1000).datetime.timestamp() == slot
+    assert report.project(slot + 1000, interpolate=True).datetime.timestamp() == slot + 1000
+
+@pytest.mark.parametrize('hours', [-24, 500])
+def test_projection_outside_of_the_forecast_fails(token, weather_manager, hours):
+    report = WeatherReport(token, 'rome', 'SI', Mode.TOMORROW, weather_manager=weather_manager)
+    with pytest.raises(ValueError):
+        report.project(time.time() + hours * 3600)
+
+def test_project_reports_skips_targets_outside_of_the_forecast(token, weather_manager):
+    report = WeatherReport(token, 'rome', 'SI', Mode.TOMORROW, weather_manager=weather_manager)
+    targets = [time.time() + hours * 3600 for hours in (0, 24, 500)]
+    results = list(project_reports([(report, None)], targets))
+
+    assert [error is None for _, error in results] == [True, True, False]
+    assert isinstance(results[-1][1], ValueError)
+
+def test_record_and_format_are_timed(token, weather_manager):
+    spans = []
+    report = WeatherReport(token, 'rome', 'SI', weather_manager=weather_manager, hooks=[spans.append])
+    report.record().format()
+    report.build()
+
+    assert [span.name for span in spans if span.name in ('build', 'export')] == ['export', 'export', 'build']
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_fetch_reports_order(token, ordered):
+    weather_manager = SlowWeatherManager('Rome', 0.2)
+    reports = [WeatherReport(token, location, 'SI', weather_manager=weather_manager) for location in ('rome', 'paris', 'berlin')]
+    locations = [report.location for report, _ in fetch_reports(reports, ordered=ordered)]
+
+    if ordered:
+        assert locations == ['Rome', 'Paris', 'Berlin']
+    else:
+        assert sorted(locations[:2]) == ['Berlin', 'Paris'] and locations[2] == 'Rome'
+
+def test_concurrent_reports_share_one_request(token):
+    weather_manager = SlowWeatherManager('Rome', 0.2)
+    reports = [WeatherReport(token, 'rome', 'SI', weather_manager=weather_manager) for _ in range(16)]
+    barrier = threading.Barrier(len(reports))
+
+    def fetch(report: WeatherReport) -> float:
+        barrier.wait()
+        return report.snapshot.timestamp
+
+    with ThreadPoolExecutor(max_workers=len(reports)) as executor:
+        timestamps = set(executor.map(fetch, reports))
+
+    assert weather_manager.calls['weather_at_place'] == 1
+    assert len(timestamps) == 1
+
+def test_concurrent_processes_share_one_request(weather, stub_server):
+    # long enough for all processes to start while the first request is in flight
+    stub_server.latency = 1.5
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda _: weather('report', '--location', 'rome', '--max-age', '0', '--format', 'ndjson'), range(4)))
+
+    assert all(result.returncode == 0 for result in results), [result.stderr for result in results]
+    assert stub_server.requests == 1
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+import json
+import threading
+
+import pytest
+
+from weather import profiling, utils
+from weather.config import DAEMONFILE
+from weather.core import Mode
+from weather.daemon import DaemonClient, RemoteReport, ReportServer
+
+
+@pytest.fixture
+def report_server(home, stub_server, transport, token):
+    transport(base_url=stub_server.base_url)
+    server = ReportServer(token)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_polled_report_is_served(report_server, stub_server):
+    stop = threading.Event()
+    poller = threading.Thread(target=report_server.poll, args=(['rome'], 'SI', 600, stop), daemon=True)
+    poller.start()
+    while stub_server.requests == 0:
+        stop.wait(0.01)
+    stop.set()
+    poller.join()
+
+    client = DaemonClient(*report_server.server_address[:2])
+    record = RemoteReport(client, 'rome', 'si', Mode.TODAY, hour=15).record()
+
+    assert record.location == 'Rome'
+    assert len(report_server.reports) == 1
+    assert stub_server.requests == 1
+
+def test_hour_selects_tomorrows_slot(report_server):
+    client = DaemonClient(*report_server.server_address[:2])
+    early, late = (RemoteReport(client, 'rome', 'SI', Mode.TOMORROW, hour=hour).record() for hour in (3, 21))
+
+    assert early != late
+    assert len(report_server.reports) == 2
+
+def test_remote_report_is_timed(report_server):
+    spans = []
+    profiling.profiler.add_hook(spans.append)
+    try:
+        RemoteReport(DaemonClient(*report_server.server_address[:2]), 'rome', 'SI').record()
+    finally:
+        profiling.profiler.remove_hook(spans.append)
+
+    # the server runs in this process too, so only look at the spans of the client
+    spans = [span for span in spans if span.thread == threading.get_ident()]
+    assert [span.name for span in spans] == ['fetch', 'export']
+    assert spans[0].attributes['status'] == 200
+
+def test_cli_bypasses_the_server_for_another_token(report_server, weather):
+    host, port = report_server.server_address[:2]
+    utils.get_config_dir().joinpath(DAEMONFILE).write_text(json.dumps({'pid': 0, 'host': host, 'port': port}), encoding='utf-8')
+
+    assert weather('report').returncode == 0
+    assert len(report_server.reports) == 1
+
+    assert weather('report', '--token', 'f' * 32, '--location', 'paris').returncode == 0
+    assert len(report_server.reports) == 1
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+
+import io
+
+import pytest
+
+from weather.core import ReportRecord
+from weather.export import read_binary, write_binary
+
+RECORDS = [
+    ReportRecord(1_600_000_000.5, 'Berlin', 'SI', 10.25, 12.5, 14.75, 3.5, 70, 20),
+    ReportRecord(1_600_003_600.0, 'São Paulo', 'IMPERIAL', 68.0, 71.6, 75.2, 7.8, 100, 0),
+]
+
+def test_binary_round_trip():
+    file = io.BytesIO()
+    assert write_binary(RECORDS, file) == len(RECORDS)
+    file.seek(0)
+    assert list(read_binary(file)) == RECORDS
+
+def test_binary_round_trip_without_records():
+    file = io.BytesIO()
+    assert write_binary([], file) == 0
+    file.seek(0)
+    assert list(read_binary(file)) == []
+
+def test_read_binary_rejects_other_files():
+    with pytest.raises(ValueError):
+        list(read_binary(io.BytesIO(b'Date,Location\n')))
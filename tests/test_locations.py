@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+import pytest
+
+from weather.locations import City, LocationIndex, normalize, split_query
+
+CITIES = [
+    (2950159, 'Berlin', 52.524368, 13.41053, 'DE'),
+    (4348460, 'Berlin', 38.32262, -75.21769, 'MD'),
+    (5128638, 'New York', 43.000351, -75.499901, 'NY'),
+    (6167865, 'Toronto', 43.700111, -79.416298, 'CA'),
+    (5368361, 'Los Angeles', 34.052231, -118.243683, 'CA'),
+]
+
+@pytest.fixture
+def locations(tmp_path):
+    with LocationIndex(tmp_path.joinpath('locations.db')) as locations:
+        with locations.connection:
+            locations.connection.executemany("INSERT INTO cities VALUES (?, ?, ?, ?, ?, ?)", ((id, name, normalize(name), lat, lon, country) for id, name, lat, lon, country in CITIES))
+        yield locations
+
+def test_split_query():
+    assert split_query('Berlin') == ('Berlin', None)
+    assert split_query('berlin, de') == ('berlin', 'DE')
+    assert split_query('Albany,NY,US') == ('Albany', 'NY')
+
+@pytest.mark.parametrize('query', ['new york,us', 'New York,USA', 'new york,ny,us'])
+def test_us_cities_are_found_by_country_code(locations, query):
+    assert [city.id for city in locations.search(query)] == [5128638]
+    assert locations.resolve(query).id == 5128638
+
+def test_state_codes_are_told_apart_from_country_codes(locations):
+    assert [city.id for city in locations.search('berlin,us')] == [4348460]
+    assert [city.id for city in locations.search('berlin,de')] == [2950159]
+    assert locations.search('toronto,us') == []
+    assert [city.id for city in locations.search('los angeles,us')] == [5368361]
+
+def test_city_query():
+    assert City(*CITIES[1][:2], 'MD', *CITIES[1][2:4]).query == 'Berlin,MD,US'
+    assert City(*CITIES[0][:2], 'DE', *CITIES[0][2:4]).query == 'Berlin,DE'
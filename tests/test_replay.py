@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+import json
+
+import pytest
+from pyowm.commons import exceptions
+
+from weather.core import Mode, WeatherReport
+from weather.locations import LocationIndex
+from weather.replay import StubServer, fixture_name, synthetic_observation
+
+
+def test_fixture_name_ignores_api_key_and_language():
+    assert fixture_name('weather', {'q': 'Rome', 'APPID': 'a', 'lang': 'en'}) == fixture_name('weather', {'q': 'Rome', 'APPID': 'b'})
+    assert fixture_name('weather', {'q': 'Rome'}) != fixture_name('weather', {'q': 'Paris'})
+
+def test_synthetic_data_is_deterministic():
+    # seeded by the case-insensitive name, so that 'Rome' and 'rome' report the same weather
+    assert synthetic_observation('Rome', 1_600_000_000)['main'] == synthetic_observation('rome', 1_600_000_000)['main']
+
+def test_stub_server_answers_every_endpoint():
+    server = StubServer()
+    try:
+        for path, params in (('weather', {'q': 'Rome'}), ('forecast', {'q': 'Rome'}), ('group', {'id': '1,2,3'}), ('box/city', {'bbox': '0,0,10,10,10'})):
+            status, body = server.respond(path, params)
+            assert status == 200, (path, body)
+        assert len(json.loads(server.respond('group', {'id': '1,2,3'})[1])['list']) == 3
+        assert server.respond('nowhere', {})[0] == 404
+    finally:
+        server.server_close()
+
+def test_stub_server_fails_at_the_configured_rate():
+    server = StubServer(error_rate=1)
+    try:
+        assert server.respond('weather', {'q': 'Rome'})[0] == 503
+    finally:
+        server.server_close()
+
+@pytest.mark.parametrize('mode', [Mode.TODAY, Mode.TOMORROW])
+def test_record_then_replay_offline(home, stub_server, transport, token, tmp_path, mode):
+    fixtures = tmp_path.joinpath('fixtures')
+
+    transport(base_url=stub_server.base_url, record=str(fixtures))
+    recorded = WeatherReport(token, 'rome', 'SI', mode).export()
+    assert list(fixtures.glob('*.json'))
+
+    requests = stub_server.requests
+    transport(replay=str(fixtures))
+    replayed = WeatherReport(token, 'rome', 'SI', mode).export()
+
+    assert stub_server.requests == requests
+    # everything but the local fetch time comes from the fixture
+    assert replayed[1:] == recorded[1:]
+
+def test_record_then_replay_with_location_index(home, stub_server, transport, token, tmp_path):
+    fixtures = tmp_path.joinpath('fixtures')
+    with LocationIndex(tmp_path.joinpath('locations.db')) as locations:
+        transport(base_url=stub_server.base_url, record=str(fixtures))
+        recorded = WeatherReport(token, 'rome', 'SI', locations=locations).export()
+        transport(replay=str(fixtures))
+        replayed = WeatherReport(token, 'rome', 'SI', locations=locations).export()
+
+    assert replayed[1:] == recorded[1:]
+
+def test_replay_without_fixture_fails(home, transport, token, tmp_path):
+    transport(replay=str(tmp_path))
+    with pytest.raises(exceptions.APIRequestError):
+        WeatherReport(token, 'rome', 'SI').export()
+
+def test_cli_report_against_stub_server(weather, stub_server):
+    result = weather('report', '--location', 'rome', 'paris', '--format', 'ndjson')
+    assert result.returncode == 0, result.stderr
+    assert sorted(json.loads(line)['Location'] for line in result.stdout.splitlines()) == ['Paris', 'Rome']
+    assert stub_server.requests == 2
+
+def test_cli_timings_include_build_and_export(weather, stub_server):
+    result = weather('--timings', 'report', '--location', 'rome', 'paris')
+    assert result.returncode == 0, result.stderr
+    phases = {line.split()[0]: line.split()[1] for line in result.stderr.splitlines() if line.strip()}
+    assert phases['export'] == phases['build'] == '2'
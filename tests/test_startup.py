@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import weather
+
+SRC = str(Path(weather.__file__).parents[1])
+
+# cumulative import time of weather.cli (about 0.13s on a laptop), with
+# enough headroom for slow CI runners
+IMPORT_BUDGET = 0.5
+# only needed once a report hits the network or aggregates saved reports
+DEFERRED_MODULES = ('pyowm', 'requests', 'urllib3', 'numpy', 'aiohttp')
+
+def import_times(module: str) -> dict:
+    """
+    Return the cumulative import time in seconds of every module imported by `module`.
+    """
+    env = {**os.environ, 'PYTHONPATH': SRC}
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', f"import {module}"], env=env, capture_output=True, text=True, check=True).stderr
+    times = dict()
+    for line in stderr.splitlines():
+        if line.startswith('import time:') and '|' in line and 'cumulative' not in line:
+            _, cumulative, name = line.split('|')
+            times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+def test_cli_defers_heavy_imports():
+    imported = import_times('weather.cli')
+    assert not [name for name in imported if name.split('.')[0] in DEFERRED_MODULES]
+
+def test_cli_import_time_budget():
+    best = min(import_times('weather.cli')['weather.cli'] for _ in range(3))
+    assert best < IMPORT_BUDGET, f"importing weather.cli took {best:.3f}s (budget {IMPORT_BUDGET}s)"
+
+def test_version_has_no_side_effects(home):
+    env = {**os.environ, 'PYTHONPATH': SRC}
+    subprocess.run([sys.executable, '-m', 'weather', '--version'], env=env, capture_output=True, check=True)
+    assert not any(home.iterdir())
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from weather.stats import aggregate, load_columns, normalize_units
+
+DAY = 86_400
+
+def row(date: float, location: str, unit_system: str, temperature: float, wind_speed: float) -> dict:
+    return {
+        'Date': str(date), 'Location': location, 'UnitSystem': unit_system,
+        'TemperatureMin': str(temperature - 1), 'TemperatureNow': str(temperature), 'TemperatureMax': str(temperature + 1),
+        'WindSpeed': str(wind_speed), 'Humidity': '50'
+    }
+
+ROWS = [
+    # Rome: two reports on day 0 (one in imperial units), one on day 1 and day 2
+    row(0 * DAY + 100, 'Rome', 'SI', 10.0, 2.0),
+    row(0 * DAY + 200, 'Rome', 'IMPERIAL', 68.0, 2.2369362920544),
+    row(2 * DAY + 100, 'Rome', 'SI', 30.0, 4.0),
+    row(1 * DAY + 100, 'Rome', 'SI', 15.0, 1.0),
+    # Paris: one report on day 0 and day 1
+    row(0 * DAY + 300, 'Paris', 'SI', 5.0, 3.0),
+    row(1 * DAY + 300, 'Paris', 'SI', 7.0, 5.0),
+]
+
+def test_aggregate_by_day():
+    stats = aggregate(normalize_units(load_columns(ROWS), 'SI'), resample='day', window=2)
+
+    assert list(stats['Location']) == ['Paris', 'Paris', 'Rome', 'Rome', 'Rome']
+    assert list(stats['Period']) == [0, DAY, 0, DAY, 2 * DAY]
+    assert list(stats['Count']) == [1, 1, 2, 1, 1]
+    # 68°F and 2.24 mph (20°C and 1 m/s) are converted before Rome's first day is averaged
+    np.testing.assert_allclose(stats['TemperatureMean'], [5, 7, 15, 15, 30])
+    np.testing.assert_allclose(stats['TemperatureMin'], [4, 6, 9, 14, 29])
+    np.testing.assert_allclose(stats['WindSpeedMean'], [3, 5, 1.5, 1, 4], rtol=1e-6)
+    np.testing.assert_allclose(stats['WindSpeedMax'], [3, 5, 2, 1, 4], rtol=1e-6)
+    # the rolling window starts over for every location
+    np.testing.assert_allclose(stats['TemperatureRolling'], [5, 6, 15, 15, 22.5])
+
+def test_aggregate_without_resampling():
+    stats = aggregate(normalize_units(load_columns(ROWS), 'SI'), resample='none')
+
+    assert list(stats['Location']) == ['Paris', 'Rome']
+    assert list(stats['Count']) == [2, 4]
+
+def test_aggregate_without_rows():
+    assert aggregate(load_columns([])) == {}
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+import pytest
+
+from weather.core import ReportRecord
+from weather.storage import STORAGE_BACKENDS, migrate
+
+ROWS = [
+    ReportRecord(1_600_000_000.0, 'Berlin', 'SI', 10.0, 12.0, 14.0, 3.5, 70, 20),
+    ReportRecord(1_600_003_600.0, 'New york, usa', 'SI', 20.0, 22.0, 24.0, 1.5, 40, 0),
+    ReportRecord(1_600_007_200.0, 'Berlin', 'IMPERIAL', 50.0, 53.6, 57.2, 7.8, 65, 90),
+]
+
+@pytest.fixture(params=list(STORAGE_BACKENDS))
+def report_store(request, home):
+    return STORAGE_BACKENDS[request.param]()
+
+def test_append_and_read(report_store):
+    assert report_store.empty()
+    report_store.append(ROWS)
+    assert not report_store.empty()
+    assert [row['Location'] for row in report_store.read()] == ['Berlin', 'New york, usa', 'Berlin']
+    assert [row['Date'] for row in report_store.tail(2)] == ['1600003600.0', '1600007200.0']
+
+def test_migrate_refuses_non_empty_target(home):
+    source, target = STORAGE_BACKENDS['csv'](), STORAGE_BACKENDS['sqlite']()
+    source.append(ROWS)
+
+    assert migrate(source, target) == len(ROWS)
+    with pytest.raises(ValueError):
+        migrate(source, target)
+    assert len(list(target.read())) == len(ROWS)
+
+    assert migrate(source, target, force=True) == len(ROWS)
+    assert len(list(target.read())) == 2 * len(ROWS)
+
+def test_cli_migrate_twice(weather):
+    weather('report', '--location', 'rome', '--save')
+    assert 'Migrated 1 reports' in weather('report', 'migrate').stdout
+    second = weather('report', 'migrate')
+    assert 'already contains reports' in second.stderr
+    assert 'Migrated 1 reports' in weather('report', 'migrate', '--force').stdout
+
+@pytest.mark.parametrize('location', ['berlin', 'BERLIN', 'Berlin'])
+def test_locations_match_case_insensitively(report_store, location):
+    report_store.append(ROWS)
+    assert len(list(report_store.read([location]))) == 2
+    assert len(report_store.tail(5, [location])) == 2
+    assert [row['Location'] for row in report_store.read(['New York, USA'])] == ['New york, usa']
+
+def test_read_returns_rows_in_the_order_they_were_saved(report_store):
+    forecast = [row._replace(date=row.date + 86_400 * 3) for row in ROWS]
+    report_store.append(forecast)
+    report_store.append(ROWS)
+
+    assert [row['Date'] for row in report_store.read()] == [str(row.date) for row in forecast + ROWS]
+    assert [row['Date'] for row in report_store.read(['berlin'])] == [str(row.date) for row in forecast + ROWS if row.location == 'Berlin']
+
+def test_tail_returns_the_last_saved_rows(report_store):
+    # a forecast saved before today's report has later dates
+    forecast = [row._replace(date=row.date + 86_400 * 3) for row in ROWS]
+    report_store.append(forecast)
+    report_store.append(ROWS[:1])
+
+    assert [row['Date'] for row in report_store.tail(2)] == [str(forecast[-1].date), str(ROWS[0].date)]
+    assert [row['Date'] for row in report_store.tail(3, since=ROWS[0].date + 86_400)] == [str(row.date) for row in forecast]
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+
+import gzip
+import io
+import logging
+
+import pytest
+
+from weather.utils import LazyFileHandler, write_lines
+
+def log(handler: LazyFileHandler, message: str) -> None:
+    handler.handle(logging.makeLogRecord({'msg': message, 'levelno': logging.INFO, 'levelname': 'INFO'}))
+
+def test_log_rotation_across_processes(home, tmp_path):
+    path = tmp_path.joinpath('error.log')
+    # two handlers on the same file stand in for a daemon and a CLI run
+    daemon, cli = LazyFileHandler(path, max_bytes=64), LazyFileHandler(path, max_bytes=64)
+    try:
+        log(daemon, 'daemon started')
+        log(cli, 'x' * 64)
+        log(cli, 'cli rotated the log')
+        log(daemon, 'daemon is still logging')
+    finally:
+        daemon.close()
+        cli.close()
+
+    backups = [tmp_path.joinpath(f"error.log.{index}.gz") for index in (2, 1)]
+    assert [gzip.decompress(backup.read_bytes()).decode('utf-8').splitlines() for backup in backups] == [['daemon started'], ['x' * 64]]
+    assert path.read_text(encoding='utf-8').splitlines() == ['cli rotated the log', 'daemon is still logging']
+
+@pytest.mark.parametrize('lines', [['a\n', 'b\n', 'c\n'], ('a\n', 'b\n', 'c\n'), iter(['a\n', 'b\n', 'c\n'])])
+def test_write_lines_accepts_any_iterable(lines):
+    file = io.StringIO()
+    write_lines(lines, batch_size=2, file=file)
+    assert file.getvalue() == 'a\nb\nc\n'